@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import functools
 import logging
 import typing as T
 
@@ -8,13 +9,18 @@ import hvplot.pandas  # noqa: F401
 import pandas as pd
 import panel as pn
 
-from seareport_skill import load_stats
+from seareport_skill import concurrency
+from seareport_skill import plotcache
+from seareport_skill import profiling
+from seareport_skill import query
+from seareport_skill import service
 from seareport_skill import settings
+from seareport_skill import watcher
 
 logging.basicConfig(level=10)
 logger = logging.getLogger()
 
-pn.extension()
+pn.extension(loading_indicator=True)
 
 versions = pn.widgets.MultiSelect(
     name="Version",
@@ -28,22 +34,36 @@ metrics = pn.widgets.MultiSelect(
     sizing_mode="stretch_width",
     size=15,
 )
+period = pn.widgets.Select(
+    name="Period", options=settings.PERIODS, sizing_mode="stretch_width"
+)
 
+watcher.follow_versions(versions)
 if pn.state.location:
     pn.state.location.sync(versions, {"value": versions.name})
     pn.state.location.sync(metrics, {"value": metrics.name})
+    pn.state.location.sync(period, {"value": period.name})
+
+# XXX Normalize values: This should be done directly in the skill calculations
+BOUNDS = (-2, 2)
 
 
-def _get_stats(versions_val: list[str], metrics_val: list[str]) -> pd.DataFrame:
-    stats = load_stats()
-    stats = stats[stats.version.isin(versions_val)]
-    stats = stats[metrics_val + ["version"]]
-    stats = T.cast(pd.DataFrame, stats)
-    return stats
+def _get_stats(
+    versions_val: list[str], metrics_val: list[str], period_val: str | None = None
+) -> pd.DataFrame:
+    stats = service.stats(
+        versions_val,
+        metrics=metrics_val + ["version"],
+        bounds=BOUNDS,
+        period=period_val,
+    )
+    stats = stats.sort_values(["version"], ascending=False)
+    return T.cast(pd.DataFrame, stats)
 
 
 def _plot_metric(stats: pd.DataFrame, metric: str) -> hv.BoxWhisker:
-    plot = stats.hvplot.box(y=metric, by="version")
+    # Not categorical: holoviews would group by all the categories, even the unselected ones
+    plot = stats.astype({"version": object}).hvplot.box(y=metric, by="version")
     plot = plot.opts(
         ylabel="",
         invert_axes=True,
@@ -56,40 +76,66 @@ def _plot_metric(stats: pd.DataFrame, metric: str) -> hv.BoxWhisker:
     return plot
 
 
-def _plot_table(stats: pd.DataFrame, metric: str) -> hv.Table:
-    df = (
-        stats[[metric, "version"]]
-        .groupby("version")
-        .describe([0.05, 0.25, 0.5, 0.75, 0.95])
-        .round(3)
-    )
-    df.columns = df.columns.get_level_values(1)
-    df = df.reset_index()
-    table = df.hvplot.table().opts(height=100 + 20 * stats.version.nunique())
+def _plot_table(summary: pd.DataFrame, metric: str) -> hv.Table:
+    df = summary[summary.metric == metric].drop(columns="metric").round(3)
+    table = df.hvplot.table().opts(height=100 + 20 * len(df))
     return table
 
 
-@pn.depends(versions, metrics)
-def show_metrics(versions_val: list[str], metrics_val: list[str]):
+def _layout(
+    versions_val: list[str], metrics_val: list[str], period_val: str | None
+) -> hv.Layout:
+    with profiling.stage("load"):
+        stats = _get_stats(
+            versions_val=versions_val, metrics_val=metrics_val, period_val=period_val
+        )
+    with profiling.stage("stats"):
+        summary = query.describe(
+            metrics_val,
+            versions_val,
+            [0.05, 0.25, 0.5, 0.75, 0.95],
+            bounds=BOUNDS,
+            period=period_val,
+        )
+    with profiling.stage("plot"):
+        plots = []
+        for metric in metrics_val:
+            plots.extend(
+                [
+                    _plot_metric(stats=stats, metric=metric),
+                    _plot_table(summary=summary, metric=metric),
+                ]
+            )
+        layout = hv.Layout(plots).cols(2)  # .opts(sizing_mode="stretch_width")
+    return layout
+
+
+@pn.depends(versions, metrics, period)
+@concurrency.offload
+@profiling.instrument
+def show_metrics(
+    versions_val: list[str], metrics_val: list[str], period_val: str | None
+):
     if not versions_val:
         versions_val = list(settings.VERSIONS.values())
     if not metrics_val:
         metrics_val = list(settings.METRICS.values())
-    stats = _get_stats(versions_val=versions_val, metrics_val=metrics_val)
-    plots = []
-    for metric in metrics_val:
-        plots.extend(
-            [
-                _plot_metric(stats=stats, metric=metric),
-                _plot_table(stats=stats, metric=metric),
-            ]
-        )
-    return hv.Layout(plots).cols(2)  # .opts(sizing_mode="stretch_width")
+    # The same selection renders the same plot in every session
+    return plotcache.cached_plot(
+        "compare_models",
+        {
+            "versions": versions_val,
+            "metrics": metrics_val,
+            "period": period_val,
+            "bounds": BOUNDS,
+        },
+        functools.partial(_layout, versions_val, metrics_val, period_val),
+    )
 
 
 template = pn.template.MaterialTemplate(
     title="Metrics Table",
-    sidebar=[versions, metrics],
+    sidebar=[versions, period, metrics],
     sidebar_width=430,
     main=[
         show_metrics,
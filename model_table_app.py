@@ -4,47 +4,71 @@ import logging
 
 import panel as pn
 
-from seareport_skill import load_model_stats
+from seareport_skill import concurrency
+from seareport_skill import profiling
+from seareport_skill import service
 from seareport_skill import settings
+from seareport_skill import watcher
 
 logging.basicConfig(level=10)
 logger = logging.getLogger()
 
-pn.extension()
+pn.extension(loading_indicator=True)
 pn.extension("tabulator")
 
+SEARCH_RESULTS = 50
+
 version = pn.widgets.Select(
     name="Version", options=settings.VERSIONS, sizing_mode="stretch_width"
 )
 metrics = pn.widgets.MultiSelect(
     name="Metrics", options=settings.METRICS, size=8, sizing_mode="stretch_width"
 )
-stations = pn.widgets.CrossSelector(
-    name="Stations",
-    options=load_model_stats("v0.0").index.tolist(),
+# Only the selected stations and the search results are sent to the browser
+stations = pn.widgets.CrossSelector(name="Stations", options=[])
+station_search = pn.widgets.TextInput(
+    name="Search stations",
+    placeholder="Station ID, sector, ocean or country",
+    sizing_mode="stretch_width",
 )
 
 show_colors = pn.widgets.Checkbox(
     name="Show colors", value=False, sizing_mode="stretch_width"
 )
 
+watcher.follow_versions(version)
 if pn.state.location:
     pn.state.location.sync(version, {"value": version.name})
     pn.state.location.sync(metrics, {"value": metrics.name})
     pn.state.location.sync(stations, {"value": stations.name})
 
 
+def update_station_options(*events):
+    results = []
+    if station_search.value_input:
+        results = service.search_stations(
+            station_search.value_input, k=SEARCH_RESULTS, version=version.value
+        ).index.tolist()
+    stations.options = list(dict.fromkeys([*stations.value, *results]))
+
+
+update_station_options()
+station_search.param.watch(update_station_options, "value_input")
+version.param.watch(update_station_options, "value")
+
+
 @pn.depends(version, metrics, stations, show_colors)
+@concurrency.offload
+@profiling.instrument
 def update_dataframe(
     version_val, metrics_val, stations_val, show_colors_val
 ) -> pn.pane.DataFrame:
-    stats = load_model_stats(version_val)
-    if metrics_val:
-        stats = stats[metrics_val]
-    else:
-        stats = stats[settings.METRICS.values()]
-    if stations_val:
-        stats = stats.loc[stations_val]
+    with profiling.stage("load"):
+        stats = service.stats(
+            version_val,
+            metrics=metrics_val or settings.METRICS.values(),
+            stations=stations_val or None,
+        )
     if show_colors_val:
         df_pane = pn.widgets.Tabulator(
             stats,
@@ -63,7 +87,7 @@ def update_dataframe(
 
 template = pn.template.MaterialTemplate(
     title="Metrics Table",
-    sidebar=[version, metrics, stations, show_colors],
+    sidebar=[version, metrics, station_search, stations, show_colors],
     sidebar_width=430,
     main=[update_dataframe],
 )
@@ -1,18 +1,22 @@
 from __future__ import annotations
 
+import functools
 import logging
 
 import colorcet as cc
-import geopandas as gp
 import holoviews as hv
 import hvplot.pandas  # noqa: F401
 import pandas as pd
 import panel as pn
+import param
 
-from seareport_skill import assign_oceans
+from seareport_skill import concurrency
 from seareport_skill import load_countries
-from seareport_skill import load_model_stats
+from seareport_skill import plotcache
+from seareport_skill import profiling
+from seareport_skill import service
 from seareport_skill import settings
+from seareport_skill import watcher
 from utils.hists import hist_
 from utils.hists import scatter_plot
 from utils.taylor import taylor_diagram
@@ -20,7 +24,7 @@ from utils.taylor import taylor_diagram
 logging.basicConfig(level=10)
 logger = logging.getLogger()
 
-pn.extension("mathjax")
+pn.extension("mathjax", loading_indicator=True)
 
 version = pn.widgets.Select(
     name="Version", options=settings.VERSIONS, sizing_mode="stretch_width"
@@ -28,6 +32,9 @@ version = pn.widgets.Select(
 metrics = pn.widgets.Select(
     name="Metrics", options=settings.METRICS, sizing_mode="stretch_width"
 )
+period = pn.widgets.Select(
+    name="Period", options=settings.PERIODS, sizing_mode="stretch_width"
+)
 type_select = pn.widgets.Select(
     name="Choose Type of Selection",
     options=settings.TYPE_SELECT,
@@ -38,15 +45,17 @@ sector = pn.widgets.CrossSelector(
     name="Maritime Sectors", options=settings.SECTORS, width=400, height=720
 )
 
+watcher.follow_versions(version)
 if pn.state.location:
     pn.state.location.sync(version, {"value": version.name})
     pn.state.location.sync(metrics, {"value": metrics.name})
+    pn.state.location.sync(period, {"value": period.name})
     pn.state.location.sync(type_select, {"value": type_select.name})
     pn.state.location.sync(oceans, {"value": oceans.name})
     pn.state.location.sync(sector, {"value": sector.name})
 
 
-GDF = gp.read_file("assets/world_oceans_final.json")
+GDF = service.regions()
 T_VOID = taylor_diagram(pd.DataFrame())
 CMAP = cc.CET_C6
 
@@ -63,91 +72,159 @@ def update_color_map(df, filter_var):
     return ocean_mapping
 
 
-@pn.depends(version, metrics, type_select, oceans, sector)
-def update_plots(
-    version_val, metrics_val, type_select_val, oceans_val, sector_val
-) -> pn.pane.DataFrame:
-    stats = load_model_stats(version_val)
-    stats = assign_oceans(stats)
-    cmap = update_color_map(GDF, type_select_val)
-    if type_select_val == "ocean":
-        if oceans_val:
-            stats = stats[stats.ocean.isin(oceans_val)]
-            height = len(oceans_val) * 30 + 90
-        else:
-            height = 300
-    else:
-        if sector_val:
-            stats = stats[stats.name.isin(sector_val)]
-            height = len(sector_val) * 30 + 90
+def select_stations(
+    version_val, type_select_val, oceans_val, sector_val, period_val=None
+) -> pd.DataFrame:
+    region = oceans_val if type_select_val == "ocean" else sector_val
+    return service.stats(version_val, region=region or None, period=period_val)
+
+
+def _hist(
+    version_val, metrics_val, type_select_val, oceans_val, sector_val, period_val
+) -> hv.Overlay:
+    with profiling.stage("load"):
+        stats = select_stations(
+            version_val, type_select_val, oceans_val, sector_val, period_val
+        )
+    with profiling.stage("stats"):
+        cmap = update_color_map(GDF, type_select_val)
+        if type_select_val == "ocean":
+            height = len(oceans_val) * 30 + 90 if oceans_val else 300
         else:
-            height = 500
-    hist = hist_(
-        stats,
-        metrics_val,
-        list(settings.METRICS.keys())[
-            list(settings.METRICS.values()).index(metrics_val)
-        ],
-        g=type_select_val,
-        map=cmap,
-    ).opts(
-        show_grid=True,
-        height=height,
-        width=800,
-        default_tools=["pan"],
-        tools=["box_zoom", "reset", "save"],
+            height = len(sector_val) * 30 + 90 if sector_val else 500
+    with profiling.stage("plot"):
+        hist = hist_(
+            stats,
+            metrics_val,
+            list(settings.METRICS.keys())[
+                list(settings.METRICS.values()).index(metrics_val)
+            ],
+            g=type_select_val,
+            map=cmap,
+        ).opts(
+            show_grid=True,
+            height=height,
+            width=800,
+            default_tools=["pan"],
+            tools=["box_zoom", "reset", "save"],
+        )
+    return hist.opts(shared_axes=False)
+
+
+@pn.depends(version, metrics, type_select, oceans, sector, period)
+@concurrency.offload
+@profiling.instrument
+def update_plots(
+    version_val, metrics_val, type_select_val, oceans_val, sector_val, period_val
+) -> pn.pane.Bokeh:
+    # Only the selector of the type of selection is shown, the other one is not part of the view
+    region = oceans_val if type_select_val == "ocean" else sector_val
+    return plotcache.cached_plot(
+        "regional_stats",
+        {
+            "version": version_val,
+            "metric": metrics_val,
+            "type_select": type_select_val,
+            "region": region,
+            "period": period_val,
+        },
+        functools.partial(
+            _hist,
+            version_val,
+            metrics_val,
+            type_select_val,
+            oceans_val,
+            sector_val,
+            period_val,
+        ),
     )
 
-    taylor = taylor_diagram(
-        stats,
-        norm=True,
-        color=type_select_val,
-        cmap=cmap,
-    ).opts(
-        show_grid=True,
-        show_legend=False,
-        default_tools=["pan"],
-        tools=["hover", "box_zoom", "reset", "save"],
+
+@profiling.instrument
+def selected_stations(
+    version_val, type_select_val, oceans_val, sector_val, period_val=None
+) -> dict:
+    with profiling.stage("load"):
+        stats = select_stations(
+            version_val, type_select_val, oceans_val, sector_val, period_val
+        )
+    return {"stats": stats, "type_select": type_select_val}
+
+
+@profiling.instrument
+def taylor_points(data: dict) -> hv.Points:
+    if data["stats"].empty:
+        # taylor_diagram draws the grid for an empty frame, it is already drawn by T_VOID
+        return hv.Points([], ["x", "y"])
+    with profiling.stage("plot"):
+        return taylor_diagram(
+            data["stats"],
+            norm=True,
+            color=data["type_select"],
+            cmap=update_color_map(GDF, data["type_select"]),
+        ).opts(
+            show_grid=True,
+            show_legend=False,
+            default_tools=["pan"],
+            tools=["hover", "box_zoom", "reset", "save"],
+        )
+
+
+@profiling.instrument
+def station_points(data: dict) -> hv.Points:
+    with profiling.stage("plot"):
+        return scatter_plot(data["stats"][["obs_lon", "obs_lat"]], "obs_lon", "obs_lat")
+
+
+@profiling.instrument
+def regions_plot(type_select_val) -> hv.Polygons:
+    with profiling.stage("plot"):
+        return GDF.hvplot(color=type_select_val).opts(
+            cmap=update_color_map(GDF, type_select_val)
+        )
+
+
+# The Taylor diagram grid and the basemap are sent once, the selection only updates the points
+stations_pipe = hv.streams.Pipe(
+    data=selected_stations(
+        version.value, type_select.value, oceans.value, sector.value, period.value
     )
-    taylor_ = (T_VOID * taylor).opts(
+)
+taylor_plot = profiling.HoloViews(
+    (T_VOID * hv.DynamicMap(taylor_points, streams=[stations_pipe])).opts(
         width=600,
         height=600,
         title="Taylor Diagram",
     )
-    return pn.pane.HoloViews(
-        (hist + taylor_).opts(shared_axes=False), sizing_mode="stretch_width"
-    )
+)
+map_plot = profiling.HoloViews(
+    (
+        hv.DynamicMap(pn.bind(regions_plot, type_select))
+        * load_countries().hvplot().opts(color="white", line_alpha=0.9)
+        * hv.DynamicMap(station_points, streams=[stations_pipe])
+    ).opts(
+        width=1400,
+        height=600,
+        xlim=(-180, 180),
+        ylim=(-90, 90),
+    ),
+    width_policy="max",
+)
 
+offloaded_selected_stations = concurrency.offload(selected_stations)
 
-@pn.depends(type_select, version, oceans, sector)
-def map_plot(type_select_val, version_val, oceans_val, sector_val) -> pn.pane.HoloViews:
-    countries = load_countries()
-    stats = load_model_stats(version_val)
-    stats = assign_oceans(stats)
-    if type_select_val == "ocean":
-        if oceans_val:
-            stats = stats[stats.ocean.isin(oceans_val)]
-    else:
-        if sector_val:
-            stats = stats[stats.name.isin(sector_val)]
-    points = scatter_plot(stats[["obs_lon", "obs_lat"]], "obs_lon", "obs_lat")
-    cmap = update_color_map(GDF, type_select_val)
-    map_ = countries.hvplot().opts(color="white", line_alpha=0.9)
-    map_plot = (
-        GDF.hvplot(color=type_select_val).opts(
-            cmap=cmap,
-            width=1400,
-            height=600,
-            xlim=(-180, 180),
-            ylim=(-90, 90),
+
+@pn.depends(version, type_select, oceans, sector, period, watch=True)
+async def update_stations(
+    version_val, type_select_val, oceans_val, sector_val, period_val
+):
+    try:
+        data = await offloaded_selected_stations(
+            version_val, type_select_val, oceans_val, sector_val, period_val
         )
-        * map_
-        * points
-    )
-    return pn.pane.HoloViews(
-        map_plot,
-        width_policy="max",
-    )
+    except param.Skip:
+        return
+    stations_pipe.send(data)
 
 
 @pn.depends(type_select)
@@ -162,6 +239,7 @@ template = pn.template.MaterialTemplate(
     title="Regional statistics",
     sidebar=[
         version,
+        period,
         metrics,
         type_select,
         display_selector,
@@ -169,7 +247,7 @@ template = pn.template.MaterialTemplate(
     ],
     sidebar_width=430,
     main=pn.Column(
-        update_plots,
+        pn.Row(update_plots, taylor_plot),
         map_plot,
     ),
 )
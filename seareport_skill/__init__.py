@@ -1,65 +1,116 @@
 from __future__ import annotations
 
-import functools
 import pathlib
 import typing as T
 
-import geodatasets
 import geopandas as gp
 import pandas as pd
-import shapely.geometry
+
+from seareport_skill import arrow
+from seareport_skill import geo
+from seareport_skill import profiling
+from seareport_skill import schema
+from seareport_skill.profiling import cached
 
 __all__: list[str] = [
+    "assign_oceans",
+    "find_countries",
+    "find_regions",
     "load_countries",
     "load_model_stats",
+    "load_regions",
     "load_stats",
 ]
 
 
-@functools.cache
+@cached
 def load_countries() -> gp.GeoDataFrame:
-    path = geodatasets.get_path("naturalearth_land")
-    countries = gp.read_file(path)
+    countries = geo.read_basemap()
     return countries
 
 
-@functools.cache
-def load_model_stats(model_version) -> pd.DataFrame:
-    df = pd.read_parquet(f"assets/{model_version}.parquet").astype(float).sort_index()
-    return df
+@cached
+def load_stats() -> pd.DataFrame:
+    """
+    Return the stats and the regions of the stations of all the model versions.
 
+    This is the single copy of the stats: the numeric columns are memory-mapped from the Arrow file
+    and the per-version frames are slices of it. The dtypes follow ``schema``.
+    """
+    path = arrow.build_stats(sorted(pathlib.Path("assets").glob("v*.parquet")))
+    stats = arrow.read_frame(path)
+    with profiling.stage("regions"):
+        stats = assign_oceans(stats)
+    stats = schema.compact(stats)
+    schema.validate(stats)
+    return stats
 
-@functools.cache
-def load_stats() -> pd.DataFrame:
-    dataframes = []
-    for pqfile in sorted(pathlib.Path("assets").glob("v*.parquet")):
-        version = pqfile.stem
-        df = load_model_stats(version)
-        # XXX Normalize values: This should be done directly in the skill calculations
-        df = df[(df > -2) & (df < 2)]
-        df = df.assign(version=version)
-        df["version"] = df.version.astype("category")
-        dataframes.append(df)
-    stats = pd.concat(dataframes).sort_values(["version"], ascending=False)
-    return T.cast(pd.DataFrame, stats)
-
-
-def find_ocean_for_station(station, oceans_df, xstr="longitude", ystr="latitude"):
-    point = shapely.geometry.Point(station[xstr], station[ystr])
-    for _, ocean in oceans_df.iterrows():
-        if point.within(ocean["geometry"]):
-            # Return a tuple with the two desired column values
-            return ocean["name"], ocean["ocean"]
-    # Return a tuple with None for both values if no match is found
-    return None, None
 
+@cached
+def _version_slices() -> dict[str, slice]:
+    positions = load_stats().groupby("version", observed=True).indices
+    return {
+        version: slice(indices[0], indices[-1] + 1)
+        for version, indices in positions.items()
+    }
 
-def assign_oceans(df):
-    oceans_ = gp.read_file("assets/world_oceans_final.json")
-    # Use the result_type='expand' to expand list-like results to columns
-    df[["name", "ocean"]] = df.apply(
-        lambda station: find_ocean_for_station(station, oceans_, "obs_lon", "obs_lat"),
-        axis=1,
-        result_type="expand",
+
+def load_model_stats(model_version: str) -> pd.DataFrame:
+    # The rows are sorted by version, a positional slice is a view on the mapped columns
+    return load_stats().iloc[_version_slices()[model_version]]
+
+
+@cached
+def load_regions() -> gp.GeoDataFrame:
+    regions = geo.read_regions()
+    # Build the spatial index once, all the lookups share it
+    regions.sindex
+    return regions
+
+
+def find_regions(lon: T.Any, lat: T.Any) -> pd.DataFrame:
+    """
+    Return the maritime sector (``name``) and the ``ocean`` containing each point.
+
+    Points outside of all the regions get ``None``, points on a shared edge get the first region.
+    """
+    regions = load_regions()
+    points = gp.points_from_xy(lon, lat, crs=regions.crs)
+    ipoints, iregions = regions.sindex.query(points, predicate="within")
+    first = pd.Series(iregions).groupby(ipoints).min()
+    result = pd.DataFrame(
+        {"name": None, "ocean": None}, index=range(len(points)), dtype=object
     )
+    result.loc[first.index, "name"] = regions["name"].to_numpy()[first.to_numpy()]
+    result.loc[first.index, "ocean"] = regions["ocean"].to_numpy()[first.to_numpy()]
+    return result
+
+
+@cached
+def _load_country_borders() -> gp.GeoDataFrame:
+    countries = geo.read_countries()
+    countries.sindex
+    return countries
+
+
+def find_countries(lon: T.Any, lat: T.Any, max_distance: float = 5.0) -> pd.Series:
+    """
+    Return the name of the country nearest to each point, within ``max_distance`` degrees.
+
+    The coastal stations are usually just outside of the coarse country borders, hence the nearest
+    country instead of the containing one. Points farther than ``max_distance`` get ``None``.
+    """
+    countries = _load_country_borders()
+    points = gp.points_from_xy(lon, lat, crs=countries.crs)
+    ipoints, icountries = countries.sindex.nearest(points, max_distance=max_distance)
+    result = pd.Series(None, index=range(len(points)), dtype=object)
+    # Points at the same distance of several countries get the first one
+    first = pd.Series(icountries).groupby(ipoints).min()
+    result[first.index] = countries["name"].to_numpy()[first.to_numpy()]
+    return result
+
+
+def assign_oceans(df):
+    regions = find_regions(df["obs_lon"], df["obs_lat"])
+    df[["name", "ocean"]] = regions.to_numpy()
     return df
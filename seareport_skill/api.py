@@ -0,0 +1,158 @@
+"""
+REST access to the stats, for the services that need the values of the metrics.
+
+``GET /stats?version=&metrics=&region=&stations=&period=&format=`` returns the rows of
+``service.stats`` as JSON (an array of records), CSV or an Arrow IPC stream. The lists are
+comma-separated or repeated arguments. The response is written in batches of rows, each batch is
+flushed to the client as soon as it is encoded.
+
+The ETag is strong: it hashes the content of the assets of the stats and the normalized query, so it
+is known before any data is read. A request with a matching ``If-None-Match`` gets a ``304`` without
+running the query.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import json
+import typing as T
+
+import pandas as pd
+import pyarrow as pa
+import tornado.web
+
+from seareport_skill import concurrency
+
+__all__: list[str] = [
+    "StatsHandler",
+]
+
+CONTENT_TYPES = {
+    "json": "application/json; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+# The stats only change when the assets are rebuilt, the clients revalidate with the ETag
+CACHE_CONTROL = "public, max-age=300, must-revalidate"
+BATCH_ROWS = 2**14
+
+
+class StatsHandler(tornado.web.RequestHandler):
+    """
+    ``GET /stats`` returns the stats matching the filters as JSON, CSV or Arrow.
+    """
+
+    def _list(self, name: str) -> list[str] | None:
+        values = [
+            value
+            for argument in self.get_arguments(name)
+            for value in argument.split(",")
+            if value
+        ]
+        return values or None
+
+    def _query(self) -> dict[str, list[str] | str | None]:
+        return {
+            "version": self._list("version"),
+            "metrics": self._list("metrics"),
+            "region": self._list("region"),
+            "stations": self._list("stations"),
+            "period": self.get_argument("period", None),
+        }
+
+    def _format(self) -> str:
+        fmt = self.get_argument("format", None)
+        if fmt is None:
+            accept = self.request.headers.get("Accept", "")
+            fmt = next(
+                (
+                    f
+                    for f, content_type in CONTENT_TYPES.items()
+                    if content_type.split(";")[0] in accept
+                ),
+                "json",
+            )
+        if fmt not in CONTENT_TYPES:
+            raise tornado.web.HTTPError(400, f"Unknown format: {fmt}")
+        return fmt
+
+    def compute_etag(self) -> str | None:
+        # Set from the query before the body is written, the body is never hashed
+        return None
+
+    def _load(self, query: dict[str, T.Any]) -> pd.DataFrame:
+        from seareport_skill import load_stats
+        from seareport_skill import service
+
+        versions = load_stats()["version"].cat.categories
+        unknown = set(query["version"] or []) - set(versions)
+        if unknown:
+            raise tornado.web.HTTPError(404, f"Unknown versions: {sorted(unknown)}")
+        metrics = query["metrics"]
+        if metrics is not None and "version" not in metrics:
+            metrics = ["version", *metrics]
+        try:
+            stats = service.stats(
+                query["version"],
+                metrics=metrics,
+                stations=query["stations"],
+                region=query["region"],
+                period=query["period"],
+            )
+        except ValueError as error:
+            raise tornado.web.HTTPError(400, str(error))
+        return stats.rename_axis("station").reset_index()
+
+    async def get(self) -> None:
+        from seareport_skill import service
+
+        query = self._query()
+        fmt = self._format()
+        key = json.dumps([service.fingerprint(), query, fmt], sort_keys=True)
+        self.set_header("Etag", f'"{hashlib.sha256(key.encode()).hexdigest()}"')
+        self.set_header("Cache-Control", CACHE_CONTROL)
+        self.set_header("Vary", "Accept")
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+        loop = asyncio.get_running_loop()
+        stats = await loop.run_in_executor(
+            concurrency.get_executor(), self._load, query
+        )
+        self.set_header("Content-Type", CONTENT_TYPES[fmt])
+        if fmt == "arrow":
+            await self._write_arrow(stats)
+        else:
+            await self._write_text(stats, fmt)
+
+    async def _write_text(self, stats: pd.DataFrame, fmt: str) -> None:
+        if fmt == "json":
+            self.write("[")
+        for start in range(0, max(len(stats), 1), BATCH_ROWS):
+            batch = stats.iloc[start : start + BATCH_ROWS]
+            if fmt == "csv":
+                self.write(batch.to_csv(index=False, header=start == 0))
+            elif len(batch):
+                # The metrics are float32: 7 decimals, without the noise of their float64 digits
+                records = batch.to_json(
+                    orient="records", date_format="iso", double_precision=7
+                )
+                self.write(("," if start else "") + records[1:-1])
+            await self.flush()
+        if fmt == "json":
+            self.write("]")
+
+    async def _write_arrow(self, stats: pd.DataFrame) -> None:
+        table = pa.Table.from_pandas(stats, preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=BATCH_ROWS):
+                writer.write_batch(batch)
+                self.write(sink.getvalue())
+                sink.seek(0)
+                sink.truncate()
+                await self.flush()
+        # The end-of-stream marker
+        self.write(sink.getvalue())
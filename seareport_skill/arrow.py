@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pathlib
+import typing as T
+
+import pandas as pd
+import pyarrow as pa
+
+from seareport_skill import profiling
+from seareport_skill import schema
+
+logger = logging.getLogger(__name__)
+
+ASSETS_FOLDER = pathlib.Path("assets")
+ARROW_FOLDER = ASSETS_FOLDER / "arrow"
+
+# The modification time, the size and the hash of the files, by their resolved path
+_hashes: dict[pathlib.Path, tuple[int, int, str]] = {}
+profiling.register_cache("_file_hash", lambda: len(_hashes))
+
+
+def arrow_path(name: str) -> pathlib.Path:
+    return ARROW_FOLDER / f"{name}.arrow"
+
+
+def write_frame(df: pd.DataFrame, path: pathlib.Path) -> None:
+    # Uncompressed IPC files can be memory-mapped and read without any copy
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df).combine_chunks()
+    # Keep NaN as values instead of nulls, otherwise pandas needs a copy to fill them back in
+    for i, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type) and table.column(i).null_count:
+            table = table.set_column(i, field, pa.array(df[field.name].to_numpy()))
+    # Several workers may build the same file, each one writes its own temporary file
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    tmp.replace(path)
+
+
+def read_table(path: pathlib.Path) -> pa.Table:
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_frame(path: pathlib.Path) -> pd.DataFrame:
+    """
+    Read an Arrow IPC file through a memory map.
+
+    The numeric columns of the returned DataFrame point to the mapped pages, so all the processes serving
+    the apps share a single copy of the data through the page cache.
+    """
+    return read_table(path).to_pandas(split_blocks=True)
+
+
+def _file_hash(path: pathlib.Path, mtime_ns: int, size: int) -> str:
+    # A file is only hashed again when its modification time or its size change, the new hash
+    # replaces the previous one: one entry per file
+    key = path.resolve()
+    entry = _hashes.get(key)
+    if entry is not None and entry[:2] == (mtime_ns, size):
+        profiling.record_cache("_file_hash", hit=True)
+        return entry[2]
+    profiling.record_cache("_file_hash", hit=False)
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            digest.update(block)
+    value = digest.hexdigest()
+    _hashes[key] = (mtime_ns, size, value)
+    return value
+
+
+def forget_hash(path: pathlib.Path) -> None:
+    """
+    Drop the hash of the file ``path``, when it changed or was removed.
+    """
+    _hashes.pop(path.resolve(), None)
+
+
+def fingerprint(paths: T.Iterable[pathlib.Path]) -> str:
+    """
+    Return a hash of the content of the files, and of the files in the folders.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        files = sorted(path.rglob("*")) if path.is_dir() else [path]
+        for file in files:
+            if file.is_file():
+                stat = file.stat()
+                digest.update(str(file).encode())
+                digest.update(_file_hash(file, stat.st_mtime_ns, stat.st_size).encode())
+    return digest.hexdigest()
+
+
+def is_stale(source: pathlib.Path, target: pathlib.Path) -> bool:
+    return not target.exists() or target.stat().st_mtime < source.stat().st_mtime
+
+
+def _is_compact(path: pathlib.Path) -> bool:
+    with pa.memory_map(str(path)) as source:
+        fields = pa.ipc.open_file(source).schema
+    return fields.field("bias").type == pa.float32()
+
+
+def _versions(path: pathlib.Path) -> set[str]:
+    # The dictionary of the categorical column, the values are not decoded
+    return set(
+        read_table(path).column("version").combine_chunks().dictionary.to_pylist()
+    )
+
+
+def build_stats(parquets: list[pathlib.Path]) -> pathlib.Path:
+    """
+    Gather the stats of all the model versions in a single file, with the compact schema.
+
+    The rows are sorted by version, so the stats of one version are a contiguous slice of the
+    memory-mapped columns.
+    """
+    target = arrow_path("model_stats")
+    # A removed version makes the file stale too
+    if (
+        any(is_stale(parquet, target) for parquet in parquets)
+        or not _is_compact(target)
+        or _versions(target) != {parquet.stem for parquet in parquets}
+    ):
+        logger.info("Building %s", target)
+        dataframes = []
+        for parquet in sorted(parquets):
+            df = pd.read_parquet(parquet).astype(float).sort_index()
+            df = df.assign(version=parquet.stem)
+            dataframes.append(df)
+        write_frame(schema.compact(pd.concat(dataframes)), target)
+    return target
+
+
+def build_timeseries(parquet: pathlib.Path) -> pathlib.Path:
+    # One folder per model (or for the observations), one file per station
+    target = ARROW_FOLDER / "timeseries" / parquet.parent.name / f"{parquet.stem}.arrow"
+    if is_stale(parquet, target):
+        logger.info("Converting %s to %s", parquet, target)
+        write_frame(pd.read_parquet(parquet).sort_index(), target)
+    return target
+
+
+def build() -> None:
+    build_stats(sorted(ASSETS_FOLDER.glob("v*.parquet")))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import os
+import threading
+import typing as T
+
+import panel as pn
+import param
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the rest of a burst of widget events before running a callback
+DEBOUNCE_DELAY = 0.1
+
+_executor: concurrent.futures.ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """
+    Return the executor shared by the callbacks of all the sessions of the process.
+
+    Its size follows ``pn.config.nthreads`` (``--num-threads`` or ``PANEL_NUM_THREADS``),
+    it defaults to the number of CPUs.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=pn.config.nthreads or os.cpu_count(),
+                thread_name_prefix="seareport",
+            )
+    return _executor
+
+
+def offload(
+    func: T.Callable[..., T.Any] | None = None, *, delay: float = DEBOUNCE_DELAY
+) -> T.Any:
+    """
+    Turn a blocking callback into a coroutine running on the shared executor.
+
+    The event loop of the server stays free for the other sessions while the callback runs.
+    Each call first waits ``delay`` seconds and only the last call of a burst runs: typing
+    in an input, a multi-widget change or a URL restore by ``pn.state.location.sync``
+    trigger a single recompute. The superseded calls raise ``param.Skip`` so that panel
+    keeps the current output. A call that already runs in the executor cannot be stopped:
+    it completes in its thread and only its stale result is dropped, with ``param.Skip``.
+    The apps are executed once per session, so is the decorator.
+    """
+    if func is None:
+        return functools.partial(offload, delay=delay)
+
+    latest = 0
+    pending: asyncio.Future[T.Any] | None = None
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        nonlocal latest, pending
+        latest += 1
+        call = latest
+        if delay:
+            await asyncio.sleep(delay)
+            if call != latest:
+                raise param.Skip
+        if pending is not None and not pending.done():
+            # Only stops a call still queued in the executor, not a running one
+            pending.cancel()
+        loop = asyncio.get_running_loop()
+        pending = future = loop.run_in_executor(
+            get_executor(), functools.partial(func, *args, **kwargs)
+        )
+        try:
+            result = await future
+        except asyncio.CancelledError:
+            if call != latest:
+                raise param.Skip
+            raise
+        if call != latest:
+            logger.debug("%s: dropping stale result", func.__qualname__)
+            raise param.Skip
+        return result
+
+    return wrapper
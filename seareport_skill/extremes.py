@@ -0,0 +1,167 @@
+"""
+Precomputed peak-over-threshold extremes and matched storms.
+
+``python -mseareport_skill.extremes`` computes, for every station and for a grid of quantiles and
+cluster durations, the extremes of the observed and modeled time series and the storms matched
+between each model and the observations. They are stored as one Arrow file per model and station
+in ``assets/arrow/extremes`` and ``assets/arrow/storms``. The lookups fall back to the live
+computation for the quantiles and durations that are not on the grid.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import pathlib
+import typing as T
+
+import numpy as np
+import pandas as pd
+
+from seareport_skill import arrow
+from seareport_skill import pot
+from seareport_skill.profiling import cached
+
+logger = logging.getLogger(__name__)
+
+OBS_FOLDER = pathlib.Path("01_obs")
+OBSERVED = OBS_FOLDER / "surge"
+MODELS_FOLDER = OBS_FOLDER / "model"
+
+QUANTILES = (0.9, 0.95, 0.98, 0.99, 0.995, 0.999)
+# In hours
+CLUSTER_DURATIONS = (24, 48, 72)
+
+
+def extremes_path(parquet: pathlib.Path) -> pathlib.Path:
+    return (
+        arrow.ARROW_FOLDER / "extremes" / parquet.parent.name / f"{parquet.stem}.arrow"
+    )
+
+
+def storms_path(parquet: pathlib.Path) -> pathlib.Path:
+    return arrow.ARROW_FOLDER / "storms" / parquet.parent.name / f"{parquet.stem}.arrow"
+
+
+def compute_extremes(ts: pd.Series, quantile: float, duration: int) -> pd.Series:
+    return pot.get_extremes(ts, threshold=ts.quantile(quantile), r=f"{duration}h")
+
+
+def compute_storms(
+    sim: pd.Series, obs: pd.Series, quantile: float, duration: int
+) -> pd.DataFrame:
+    from seastats.storms import get_extremes_ts
+    from seastats.storms import match_extremes
+
+    return match_extremes(get_extremes_ts(sim, obs, quantile, duration))
+
+
+def _grid(
+    func: T.Callable[..., pd.Series | pd.DataFrame], *args: pd.Series
+) -> pd.DataFrame:
+    frames = []
+    for quantile in QUANTILES:
+        for duration in CLUSTER_DURATIONS:
+            result = func(*args, quantile, duration)
+            frame = (
+                result.to_frame("value") if isinstance(result, pd.Series) else result
+            )
+            frames.append(
+                frame.assign(
+                    threshold_quantile=np.float32(quantile),
+                    cluster_duration=np.int16(duration),
+                )
+            )
+    return pd.concat(frames)
+
+
+def build_station(station: str, models: list[pathlib.Path]) -> None:
+    from seastats.stats import align_ts
+
+    from seareport_skill import service
+
+    obs_parquet = OBSERVED / f"{station}.parquet"
+    obs = service.timeseries(station, OBSERVED)
+    target = extremes_path(obs_parquet)
+    if arrow.is_stale(obs_parquet, target):
+        arrow.write_frame(_grid(compute_extremes, obs), target)
+    for model in models:
+        parquet = model / f"{station}.parquet"
+        if not parquet.exists():
+            continue
+        sim = service.timeseries(station, model)
+        target = extremes_path(parquet)
+        if arrow.is_stale(parquet, target):
+            arrow.write_frame(_grid(compute_extremes, sim), target)
+        target = storms_path(parquet)
+        if arrow.is_stale(parquet, target) or arrow.is_stale(obs_parquet, target):
+            sim_, obs_ = align_ts(sim, obs)
+            arrow.write_frame(_grid(compute_storms, sim_, obs_), target)
+    logger.info("Extremes of %s done", station)
+
+
+def build(max_workers: int | None = None) -> None:
+    stations = sorted(path.stem for path in OBSERVED.glob("*.parquet"))
+    models = sorted(path for path in MODELS_FOLDER.glob("*") if path.is_dir())
+    # The storm matching is CPU bound and mostly pure Python, one process per station
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        futures = [
+            executor.submit(build_station, station, models) for station in stations
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+
+
+@cached
+def _read(path: pathlib.Path) -> pd.DataFrame | None:
+    return arrow.read_frame(path) if path.exists() else None
+
+
+def _lookup(path: pathlib.Path, quantile: float, duration: int) -> pd.DataFrame | None:
+    if not np.isclose(QUANTILES, quantile).any() or duration not in CLUSTER_DURATIONS:
+        return None
+    store = _read(path)
+    if store is None:
+        return None
+    mask = np.isclose(store["threshold_quantile"], quantile)
+    mask &= store["cluster_duration"].to_numpy() == duration
+    return store[mask].drop(columns=["threshold_quantile", "cluster_duration"])
+
+
+def get_extremes(
+    station: str, model: str | pathlib.Path, quantile: float, duration: int = 72
+) -> pd.Series:
+    """
+    Return the POT extremes of a time series, from the store when they are on the grid.
+    """
+    from seareport_skill import service
+
+    parquet = pathlib.Path(model) / f"{station}.parquet"
+    stored = _lookup(extremes_path(parquet), quantile, duration)
+    if stored is not None:
+        return stored["value"]
+    return compute_extremes(service.timeseries(station, model), quantile, duration)
+
+
+def get_storms(
+    station: str,
+    model: str | pathlib.Path,
+    sim: pd.Series,
+    obs: pd.Series,
+    quantile: float,
+    duration: int = 72,
+) -> pd.DataFrame:
+    """
+    Return the storms matched between the aligned ``sim`` and ``obs`` series of a model,
+    from the store when they are on the grid.
+    """
+    parquet = pathlib.Path(model) / f"{station}.parquet"
+    stored = _lookup(storms_path(parquet), quantile, duration)
+    if stored is not None:
+        return stored
+    return compute_storms(sim, obs, quantile, duration)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build()
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import logging
+import pathlib
+
+import geopandas as gp
+import shapely
+
+logger = logging.getLogger(__name__)
+
+COUNTRIES_SHP = pathlib.Path(
+    "assets/ne_110m_admin_0_countries/ne_110m_admin_0_countries.shp"
+)
+BASEMAP = pathlib.Path("assets/naturalearth_land.feather")
+REGIONS_JSON = pathlib.Path("assets/world_oceans_final.json")
+REGIONS = pathlib.Path("assets/world_oceans_final.parquet")
+REGIONS_COLUMNS = ["id", "ocean", "name", "geometry"]
+# In degrees, well below the resolution of the 110m source at the zoom levels of the apps
+BASEMAP_TOLERANCE = 0.05
+
+
+def build_basemap() -> pathlib.Path:
+    """
+    Build the land polygons of the maps from the vendored Natural Earth countries.
+
+    The borders are dissolved and the polygons simplified, the result is stored as uncompressed
+    Feather (Arrow IPC) so that loading it is a memory-mapped read without any network access.
+    """
+    countries = gp.read_file(COUNTRIES_SHP)
+    land = shapely.union_all(countries.geometry.values)
+    basemap = gp.GeoDataFrame(geometry=[land], crs=countries.crs)
+    basemap = basemap.explode(index_parts=False).reset_index(drop=True)
+    basemap["geometry"] = basemap.simplify(BASEMAP_TOLERANCE, preserve_topology=True)
+    basemap.to_feather(BASEMAP, compression="uncompressed")
+    logger.info("Wrote %s", BASEMAP)
+    return BASEMAP
+
+
+def read_basemap() -> gp.GeoDataFrame:
+    return gp.read_feather(BASEMAP, memory_map=True)
+
+
+def read_countries() -> gp.GeoDataFrame:
+    return gp.read_file(COUNTRIES_SHP, columns=["NAME"]).rename(
+        columns={"NAME": "name"}
+    )
+
+
+def build_regions() -> pathlib.Path:
+    """
+    Convert the oceans and maritime sectors from GeoJSON to GeoParquet.
+
+    Only the columns used by the apps are kept, the coordinates are stored as WKB.
+    """
+    regions = gp.read_file(REGIONS_JSON)[REGIONS_COLUMNS]
+    regions.to_parquet(REGIONS)
+    logger.info("Wrote %s", REGIONS)
+    return REGIONS
+
+
+def read_regions() -> gp.GeoDataFrame:
+    return gp.read_parquet(REGIONS)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_basemap()
+    build_regions()
@@ -0,0 +1,169 @@
+"""
+Extraction of the station time series from the output of a model on an unstructured mesh.
+
+The output (NetCDF files or a Zarr store, SCHISM or thalassa names) is opened lazily with xarray
+and dask. The nearest node of each station is found by streaming the node coordinates in chunks:
+each chunk gets its own KD-tree (``spatial.StationIndex``) and each station keeps its nearest node
+so far. The series of the nodes are then read in batches of stations, sorted by node so that a
+batch touches few chunks of the file, and written to ``01_obs/model/<version>/<station>.parquet``,
+the layout read by the apps. The memory depends on the chunk and batch sizes, not on the size of
+the mesh.
+
+    python -mseareport_skill.ingest v2.2 outputs/out2d_*.nc
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import pathlib
+import typing as T
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from seareport_skill import spatial
+from seareport_skill.extremes import MODELS_FOLDER
+
+logger = logging.getLogger(__name__)
+
+__all__: list[str] = [
+    "extract",
+    "nearest_nodes",
+    "open_model",
+]
+
+# Names of the nodes and of their coordinates, the SCHISM ones are renamed to the thalassa ones
+SCHISM_NAMES = {
+    "nSCHISM_hgrid_node": "node",
+    "SCHISM_hgrid_node_x": "lon",
+    "SCHISM_hgrid_node_y": "lat",
+}
+NODE_CHUNK = 1_000_000
+STATION_BATCH = 256
+
+
+def open_model(paths: T.Sequence[str | pathlib.Path]) -> xr.Dataset:
+    """
+    Open the output of a model lazily: one Zarr store, or NetCDF files concatenated along time.
+    """
+    paths = [pathlib.Path(path) for path in paths]
+    if len(paths) == 1 and paths[0].suffix == ".zarr":
+        ds = xr.open_zarr(paths[0])
+    else:
+        # The mesh is the same in every file, it is only read from the first one
+        ds = xr.open_mfdataset(
+            sorted(paths),
+            combine="nested",
+            concat_dim="time",
+            data_vars="minimal",
+            coords="minimal",
+            compat="override",
+            chunks={},
+        )
+    names = {*ds.variables, *ds.dims}
+    return ds.rename({old: new for old, new in SCHISM_NAMES.items() if old in names})
+
+
+def nearest_nodes(
+    ds: xr.Dataset,
+    stations: spatial.StationIndex,
+    chunk_size: int = NODE_CHUNK,
+) -> pd.DataFrame:
+    """
+    Return the nearest ``node`` of each station and its ``distance`` in km, indexed by station.
+    """
+    nnodes = ds.sizes["node"]
+    node = np.zeros(len(stations), dtype=np.int64)
+    distance = np.full(len(stations), np.inf)
+    for start in range(0, nnodes, chunk_size):
+        chunk = ds[["lon", "lat"]].isel(node=slice(start, start + chunk_size)).load()
+        index = spatial.StationIndex(
+            np.arange(start, start + chunk.sizes["node"]),
+            chunk["lon"].to_numpy(),
+            chunk["lat"].to_numpy(),
+        )
+        nodes, distances = index.nearest_each(stations.lon, stations.lat)
+        closer = distances < distance
+        node[closer] = nodes[closer]
+        distance[closer] = distances[closer]
+    return pd.DataFrame({"node": node, "distance": distance}, index=stations.stations)
+
+
+def extract(
+    ds: xr.Dataset,
+    version: str,
+    stations: spatial.StationIndex,
+    variable: str = "elev",
+    max_distance: float | None = None,
+    batch_size: int = STATION_BATCH,
+) -> pd.DataFrame:
+    """
+    Write the series of ``variable`` at the nearest node of each station, return the nodes.
+
+    The stations further than ``max_distance`` km from the mesh are skipped.
+    """
+    nodes = nearest_nodes(ds, stations).sort_values("node")
+    if max_distance is not None:
+        far = nodes["distance"] > max_distance
+        if far.any():
+            logger.warning(
+                "Skipping %d stations further than %s km from the mesh: %s",
+                far.sum(),
+                max_distance,
+                ", ".join(nodes.index[far]),
+            )
+        nodes = nodes[~far]
+    folder = MODELS_FOLDER / version
+    folder.mkdir(parents=True, exist_ok=True)
+    times = ds.indexes["time"]
+    for start in range(0, len(nodes), batch_size):
+        batch = nodes.iloc[start : start + batch_size]
+        # dask reads the chunks of the batch in parallel
+        values = (
+            ds[variable].isel(node=batch["node"].to_numpy()).transpose("time", "node")
+        )
+        values = values.to_numpy()
+        for i, station in enumerate(batch.index):
+            df = pd.DataFrame({variable: values[:, i]}, index=times)
+            df.to_parquet(folder / f"{station}.parquet")
+        logger.info("Extracted %d/%d stations", start + len(batch), len(nodes))
+    return nodes
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Extract the station time series from the output of a model"
+    )
+    parser.add_argument("version", help="The model version, e.g. v2.2")
+    parser.add_argument("paths", nargs="+", help="NetCDF files or a Zarr store")
+    parser.add_argument("--variable", default="elev")
+    parser.add_argument(
+        "--max-distance",
+        type=float,
+        default=None,
+        help="Skip the stations further than this distance (km) from the mesh",
+    )
+    parser.add_argument("--batch-size", type=int, default=STATION_BATCH)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    from seareport_skill import service
+
+    args = get_parser().parse_args(argv)
+    ds = open_model(args.paths)
+    extract(
+        ds,
+        args.version,
+        service.station_index(),
+        variable=args.variable,
+        max_distance=args.max_distance,
+        batch_size=args.batch_size,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
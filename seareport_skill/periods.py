@@ -0,0 +1,113 @@
+"""
+Skill of the models per month and per season.
+
+``python -mseareport_skill.periods`` aligns the model and observed series of every station once and
+computes the metrics of every period in a single vectorized pass: each period is a column of the
+``(time, period)`` arrays given to ``skill.compute_stats``, with NaN outside of the period. The
+stations are processed in parallel and the results are written as a parquet dataset partitioned by
+``version`` (the model folder) and ``period`` in ``assets/arrow/periods``, where ``query`` reads the
+slices that the apps ask for.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from seareport_skill import arrow
+from seareport_skill import schema
+from seareport_skill import skill
+from seareport_skill.extremes import MODELS_FOLDER
+from seareport_skill.extremes import OBSERVED
+
+logger = logging.getLogger(__name__)
+
+__all__: list[str] = [
+    "build",
+    "period_stats",
+    "PERIODS",
+]
+
+PERIODS_FOLDER = arrow.ARROW_FOLDER / "periods"
+SEASONS = {"DJF": (12, 1, 2), "MAM": (3, 4, 5), "JJA": (6, 7, 8), "SON": (9, 10, 11)}
+# The months are "01" to "12"
+PERIODS = [f"{month:02d}" for month in range(1, 13)] + list(SEASONS)
+
+
+def period_stats(sim: pd.Series, obs: pd.Series) -> pd.DataFrame:
+    """
+    Return the metrics of ``skill.METRICS`` (columns) of each period of ``PERIODS`` (rows).
+
+    The storm metrics are left out: they need the storms matched within each period.
+    """
+    index, sim_values, obs_values = skill.align({"sim": sim}, obs)
+    months = index.month.to_numpy()
+    masks = np.column_stack(
+        [months == int(period) for period in PERIODS[:12]]
+        + [np.isin(months, season) for season in SEASONS.values()]
+    )
+    sim_periods = np.where(masks, sim_values, np.nan)
+    obs_periods = np.where(masks, obs_values, np.nan)
+    return skill.compute_stats(sim_periods, obs_periods, PERIODS)
+
+
+def build_station(station: str, models: list[pathlib.Path]) -> pd.DataFrame:
+    from seareport_skill import service
+
+    obs = service.timeseries(station, OBSERVED)
+    frames = []
+    for model in models:
+        if obs.isna().all() or not (model / f"{station}.parquet").exists():
+            continue
+        sim = service.timeseries(station, model)
+        if sim.isna().all():
+            # No time step to align to
+            continue
+        stats = period_stats(sim, obs)
+        frames.append(
+            stats.rename_axis("period")
+            .reset_index()
+            .assign(version=model.name, station=station)
+        )
+    logger.info("Periods of %s done", station)
+    return pd.concat(frames) if frames else pd.DataFrame()
+
+
+def build(max_workers: int | None = None) -> pathlib.Path:
+    """
+    Compute the stats of the periods of every station, write them in ``PERIODS_FOLDER``.
+
+    The dataset is left as it is when there are no stats to write.
+    """
+    stations = sorted(path.stem for path in OBSERVED.glob("*.parquet"))
+    models = sorted(path for path in MODELS_FOLDER.glob("*") if path.is_dir())
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        frames = list(executor.map(build_station, stations, [models] * len(stations)))
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        logger.warning("No stats of the periods to write in %s", PERIODS_FOLDER)
+        return PERIODS_FOLDER
+    df = pd.concat(frames, ignore_index=True)
+    df = df[["version", "period", "station", *skill.METRICS]]
+    df[skill.METRICS] = df[skill.METRICS].astype(schema.METRIC_DTYPE)
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        PERIODS_FOLDER,
+        format="parquet",
+        partitioning=["version", "period"],
+        partitioning_flavor="hive",
+        existing_data_behavior="delete_matching",
+    )
+    logger.info("Wrote %s", PERIODS_FOLDER)
+    return PERIODS_FOLDER
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build()
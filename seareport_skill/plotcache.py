@@ -0,0 +1,173 @@
+"""
+On-disk cache of the rendered plots, shared by all the processes serving the apps.
+
+A view is rendered once from HoloViews to Bokeh models and stored as the JSON of a Bokeh document
+in ``assets/arrow/plots``. The key is a hash of the name of the view, the state of its widgets, the
+content of the assets it is computed from, ``VIEWS_VERSION`` and the versions of Bokeh and
+HoloViews. The other sessions, in any worker, rebuild the Bokeh models from the JSON instead of
+going through HoloViews and the data again. When the folder grows over ``MAX_BYTES``, the least
+recently used plots are evicted.
+
+Only the static views can be cached: the plots driven by streams (taps, range updates, pipes) need
+their HoloViews objects.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import typing as T
+
+import bokeh
+import holoviews as hv
+import panel as pn
+from bokeh.document import Document
+from bokeh.model import Model
+from bokeh.util.serialization import make_id
+
+from seareport_skill import arrow
+from seareport_skill import profiling
+from seareport_skill import service
+
+logger = logging.getLogger(__name__)
+
+__all__: list[str] = [
+    "cached_plot",
+    "clear",
+    "evict",
+]
+
+PLOTS_FOLDER = arrow.ARROW_FOLDER / "plots"
+MAX_BYTES = 512 * 2**20
+# Bumped when the code of the cached views changes, the previous plots are then never used again
+VIEWS_VERSION = 2
+
+
+def plot_key(name: str, state: T.Mapping[str, T.Any], assets: str) -> str:
+    content = {
+        "name": name,
+        "state": state,
+        "assets": assets,
+        "views": VIEWS_VERSION,
+        "bokeh": bokeh.__version__,
+        "holoviews": hv.__version__,
+    }
+    text = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _dumps(model: Model) -> str:
+    doc = Document()
+    doc.add_root(model)
+    # The data buffers are inlined, the file is self-contained
+    text = json.dumps(doc.to_json(deferred=False))
+    doc.remove_root(model)
+    return text
+
+
+def _renew_ids(obj: T.Any, ids: dict[str, str]) -> T.Any:
+    if isinstance(obj, dict):
+        renewed = {key: _renew_ids(value, ids) for key, value in obj.items()}
+        # The definitions and the references of the models
+        if "id" in renewed and renewed["id"] in ids:
+            renewed["id"] = ids[renewed["id"]]
+        return renewed
+    if isinstance(obj, list):
+        return [_renew_ids(value, ids) for value in obj]
+    return obj
+
+
+def _model_ids(obj: T.Any) -> T.Iterator[str]:
+    if isinstance(obj, dict):
+        if obj.get("type") == "object" and "id" in obj:
+            yield obj["id"]
+        for value in obj.values():
+            yield from _model_ids(value)
+    elif isinstance(obj, list):
+        for value in obj:
+            yield from _model_ids(value)
+
+
+def _loads(text: str) -> Model:
+    content = json.loads(text)
+    # The IDs were given by the process that rendered the plot, from a counter that every worker
+    # inherits at fork: the same IDs may already be used by the models of this process
+    ids = {old: make_id() for old in _model_ids(content)}
+    doc = Document.from_json(_renew_ids(content, ids))
+    model = doc.roots[0]
+    doc.remove_root(model)
+    return model
+
+
+def _write(path: pathlib.Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Several workers may render the same plot, each one writes its own temporary file
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(text)
+    tmp.replace(path)
+
+
+def evict(max_bytes: int = MAX_BYTES) -> int:
+    """
+    Remove the least recently used plots until the cache fits in ``max_bytes``, return their count.
+    """
+    files = []
+    for path in PLOTS_FOLDER.glob("*.json"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            # Evicted by another worker
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    evicted = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        evicted += 1
+    if evicted:
+        logger.info("Evicted %d plots from %s", evicted, PLOTS_FOLDER)
+    return evicted
+
+
+def clear() -> None:
+    for path in PLOTS_FOLDER.glob("*.json"):
+        path.unlink(missing_ok=True)
+
+
+def cached_plot(
+    name: str,
+    state: T.Mapping[str, T.Any],
+    render: T.Callable[[], T.Any],
+    assets: T.Iterable[pathlib.Path] = service.ASSETS,
+    **params: T.Any,
+) -> pn.pane.Bokeh:
+    """
+    Return a pane of the view ``name`` in ``state``, rendered by ``render`` if it is not cached.
+
+    ``render`` returns the HoloViews object of the view, ``params`` are those of the pane.
+    """
+    path = PLOTS_FOLDER / f"{plot_key(name, state, arrow.fingerprint(assets))}.json"
+    try:
+        text = path.read_text()
+    except FileNotFoundError:
+        text = None
+    profiling.record_cache("plots", hit=text is not None)
+    if text is not None:
+        with contextlib.suppress(FileNotFoundError):
+            # The modification time orders the plots for the eviction
+            os.utime(path)
+        with profiling.stage("serialize"):
+            return pn.pane.Bokeh(_loads(text), **params)
+    obj = render()
+    with profiling.stage("serialize"):
+        model = hv.render(obj, backend="bokeh")
+        _write(path, _dumps(model))
+    evict()
+    return pn.pane.Bokeh(model, **params)
@@ -0,0 +1,58 @@
+"""
+Peaks-over-threshold declustering with NumPy.
+
+Same results as ``pyextremes.get_extremes(ts, "POT", threshold=..., r=...)``: the exceedances are
+grouped in clusters separated by gaps longer than ``r`` and the first maximum (or minimum) of each
+cluster is kept. The clusters are found with array operations instead of a loop over pandas slices.
+"""
+
+from __future__ import annotations
+
+import typing as T
+import warnings
+
+import numpy as np
+import pandas as pd
+
+__all__: list[str] = [
+    "get_extremes",
+]
+
+
+def get_extremes(
+    ts: pd.Series,
+    threshold: float,
+    r: pd.Timedelta | str = "24h",
+    extremes_type: T.Literal["high", "low"] = "high",
+) -> pd.Series:
+    if extremes_type not in ("high", "low"):
+        raise ValueError(
+            f"invalid value in '{extremes_type}' for the 'extremes_type' argument"
+        )
+    values = ts.to_numpy(dtype=np.float64)
+    # Flip the sign of the low extremes so that both cases look for maxima
+    sign = 1.0 if extremes_type == "high" else -1.0
+    positions = np.flatnonzero(sign * values > sign * threshold)
+    first = np.array([], dtype=np.intp)
+    if len(positions) == 0:
+        warnings.warn(
+            f"Threshold value '{threshold}' is too {extremes_type} "
+            f"and results in zero extreme values"
+        )
+    exceedances = sign * values[positions]
+    times = ts.index[positions]
+    if len(positions):
+        # A new cluster starts after each gap longer than `r`
+        gaps = np.asarray(times[1:] - times[:-1] > pd.to_timedelta(r))
+        cluster = np.concatenate([[0], np.cumsum(gaps)])
+        starts = np.concatenate([[0], np.flatnonzero(gaps) + 1])
+        cluster_max = np.maximum.reduceat(exceedances, starts)
+        # The first maximum of each cluster, as `idxmax` does
+        candidates = np.flatnonzero(exceedances == cluster_max[cluster])
+        first = candidates[np.concatenate([[True], np.diff(cluster[candidates]) != 0])]
+    return pd.Series(
+        data=sign * exceedances[first],
+        index=pd.Index(times[first], name=ts.index.name or "date-time"),
+        dtype=np.float64,
+        name=ts.name or "extreme values",
+    )
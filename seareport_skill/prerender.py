@@ -0,0 +1,206 @@
+"""
+Static pre-rendering of the skill dashboards.
+
+``python -mseareport_skill.prerender [--output site]`` renders the views of every version and type of
+region (oceans or maritime sectors): the map and the histogram of each metric, the Taylor diagram
+and the radar plot. Each view is written as a standalone HTML page and as the ``json_item`` of its
+Bokeh model, to embed with ``Bokeh.embed.embed_item``. The views are rendered in a process pool;
+``index.html`` links all the pages and ``index.json`` lists all the files. The folder can be served by
+any static file server, without Python.
+"""
+
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import html
+import json
+import logging
+import pathlib
+import typing as T
+
+import colorcet as cc
+import holoviews as hv
+import hvplot.pandas  # noqa: F401
+import pandas as pd
+from bokeh.embed import file_html
+from bokeh.embed import json_item
+from bokeh.resources import CDN
+
+from seareport_skill import load_countries
+from seareport_skill import service
+from seareport_skill import settings
+
+logger = logging.getLogger(__name__)
+
+__all__: list[str] = [
+    "prerender",
+    "render_view",
+    "tasks",
+]
+
+OUTPUT_FOLDER = pathlib.Path("site")
+VIEWS = ("map", "hist", "taylor", "radar")
+# The views of each metric, the others summarize all the metrics
+METRIC_VIEWS = ("map", "hist")
+
+
+class Task(T.NamedTuple):
+    version: str
+    region_type: str
+    view: str
+    metric: str | None = None
+
+    @property
+    def stem(self) -> str:
+        name = self.view if self.metric is None else f"{self.view}-{self.metric}"
+        return f"{self.version}/{self.region_type}/{name}"
+
+
+def tasks() -> list[Task]:
+    return [
+        Task(version, region_type, view, metric)
+        for version in settings.VERSIONS.values()
+        for region_type in settings.TYPE_SELECT.values()
+        for view in VIEWS
+        for metric in (settings.METRICS.values() if view in METRIC_VIEWS else [None])
+    ]
+
+
+def _color_map(region_type: str) -> dict[str, str]:
+    # Same colors as the regional stats app
+    regions = service.regions()[region_type].unique()
+    factor = int(len(cc.CET_C6) / len(regions))
+    colors = hv.Cycle(cc.CET_C6).values
+    return {
+        region: colors[i * factor % len(cc.CET_C6)] for i, region in enumerate(regions)
+    }
+
+
+def _metric_name(metric: str) -> str:
+    return {value: key for key, value in settings.METRICS.items()}[metric]
+
+
+def _view(task: Task) -> T.Any:
+    from utils.hists import hist_
+    from utils.hists import radar_plot
+    from utils.hists import scatter_plot
+    from utils.taylor import taylor_diagram
+
+    stats = service.stats(task.version)
+    stats = stats[stats[task.region_type].notna()]
+    cmap = _color_map(task.region_type)
+    if task.view == "map":
+        points = scatter_plot(
+            stats[["obs_lon", "obs_lat", task.metric]],
+            "obs_lon",
+            "obs_lat",
+            z=task.metric,
+            cmap="rainbow",
+            colorbar=True,
+        )
+        return (
+            service.regions().hvplot(color=task.region_type).opts(cmap=cmap)
+            * load_countries().hvplot().opts(color="white", line_alpha=0.9)
+            * points
+        ).opts(width=1400, height=600, xlim=(-180, 180), ylim=(-90, 90))
+    if task.view == "hist":
+        return hist_(
+            stats,
+            task.metric,
+            _metric_name(task.metric),
+            g=task.region_type,
+            map=cmap,
+        ).opts(
+            show_grid=True,
+            height=300 if task.region_type == "ocean" else 500,
+            width=800,
+            shared_axes=False,
+        )
+    if task.view == "taylor":
+        return (
+            taylor_diagram(pd.DataFrame())
+            * taylor_diagram(stats, norm=True, color=task.region_type, cmap=cmap)
+        ).opts(width=600, height=600, title="Taylor Diagram", show_legend=False)
+    regions = [str(region) for region in stats[task.region_type].unique()]
+    return radar_plot(
+        stats, settings.METRICS_SPIDER, regions, g=task.region_type, color_map=cmap
+    ).opts(width=500, height=500, legend_opts={"background_fill_alpha": 0.5})
+
+
+def render_view(task: Task, output: pathlib.Path) -> dict[str, str | None]:
+    """
+    Write the HTML page and the JSON item of a view, return its entry of the index.
+    """
+    model = hv.render(_view(task), backend="bokeh")
+    target = output / task.stem
+    target.parent.mkdir(parents=True, exist_ok=True)
+    title = f"{task.version} {task.view} {task.metric or ''}".strip()
+    target.with_suffix(".html").write_text(file_html(model, CDN, title))
+    item = json_item(model, target=task.stem.replace("/", "-"))
+    target.with_suffix(".json").write_text(json.dumps(item))
+    return {
+        **task._asdict(),
+        "html": f"{task.stem}.html",
+        "json": f"{task.stem}.json",
+    }
+
+
+def _render_index(entries: list[dict[str, T.Any]]) -> str:
+    versions = {value: key for key, value in settings.VERSIONS.items()}
+    region_types = {value: key for key, value in settings.TYPE_SELECT.items()}
+    sections = []
+    for version in versions:
+        rows = []
+        for region_type in region_types:
+            for view in VIEWS:
+                links = " ".join(
+                    f'<a href="{html.escape(e["html"])}">{html.escape(e["metric"] or view)}</a>'
+                    for e in entries
+                    if (e["version"], e["region_type"], e["view"])
+                    == (version, region_type, view)
+                )
+                rows.append(
+                    f"<tr><th>{html.escape(region_types[region_type])}</th>"
+                    f"<th>{view}</th><td>{links}</td></tr>"
+                )
+        sections.append(
+            f"<h2>{html.escape(versions[version])} ({html.escape(version)})</h2>"
+            f"<table>{''.join(rows)}</table>"
+        )
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        "<title>Seareport skill</title></head><body><h1>Seareport skill</h1>"
+        f"{''.join(sections)}</body></html>"
+    )
+
+
+def prerender(
+    output: pathlib.Path = OUTPUT_FOLDER, max_workers: int | None = None
+) -> pathlib.Path:
+    todo = tasks()
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        entries = list(executor.map(render_view, todo, [output] * len(todo)))
+    (output / "index.json").write_text(json.dumps(entries, indent=1))
+    (output / "index.html").write_text(_render_index(entries))
+    logger.info("Rendered %d views to %s", len(entries), output)
+    return output / "index.html"
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Render the dashboards of every version, metric and region type"
+    )
+    parser.add_argument("--output", type=pathlib.Path, default=OUTPUT_FOLDER)
+    parser.add_argument("--max-workers", type=int, default=None)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = get_parser().parse_args(argv)
+    prerender(args.output, args.max_workers)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
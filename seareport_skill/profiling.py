@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import contextvars
+import functools
+import inspect
+import logging
+import pathlib
+import threading
+import time
+import typing as T
+
+import pandas as pd
+import panel as pn
+import tornado.web
+
+logger = logging.getLogger(__name__)
+
+__all__: list[str] = [
+    "cached",
+    "HoloViews",
+    "instrument",
+    "MetricsHandler",
+    "render_prometheus",
+    "stage",
+]
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+_callback: contextvars.ContextVar[str] = contextvars.ContextVar("callback", default="")
+_lock = threading.Lock()
+
+
+class _Histogram:
+    def __init__(self) -> None:
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+
+_durations: dict[tuple[str, str], _Histogram] = collections.defaultdict(_Histogram)
+_cache_requests: collections.Counter[tuple[str, str]] = collections.Counter()
+# The number of entries of the caches, by their name
+_cache_sizes: list[tuple[str, T.Callable[[], int]]] = []
+
+
+def _label(func: T.Callable[..., T.Any]) -> str:
+    # Apps served by panel live in anonymous `bokeh_app_<uuid>` modules, use the file name instead
+    return f"{pathlib.Path(func.__code__.co_filename).stem}.{func.__qualname__}"
+
+
+def observe(name: str, duration: float, callback: str | None = None) -> None:
+    callback = callback or _callback.get() or "-"
+    with _lock:
+        _durations[(callback, name)].observe(duration)
+    logger.debug("%s: %s took %.3fs", callback, name, duration)
+
+
+def record_cache(name: str, hit: bool) -> None:
+    with _lock:
+        _cache_requests[(name, "hit" if hit else "miss")] += 1
+
+
+def register_cache(name: str, size: T.Callable[[], int]) -> None:
+    """
+    Report the number of entries ``size()`` of the cache ``name`` with its lookups.
+    """
+    with _lock:
+        _cache_sizes.append((name, size))
+
+
+def _sizes() -> dict[str, int]:
+    with _lock:
+        funcs = list(_cache_sizes)
+    # The functions of the same name share their lookups, they share their sizes too
+    sizes: collections.Counter[str] = collections.Counter()
+    for name, size in funcs:
+        sizes[name] += size()
+    return dict(sizes)
+
+
+@contextlib.contextmanager
+def stage(name: str, callback: str | None = None) -> T.Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, callback)
+
+
+def instrument(func: T.Callable[..., T.Any]) -> T.Callable[..., T.Any]:
+    """
+    Time a callback as a whole (stage ``total``) and label the stages recorded while it runs.
+    """
+    label = _label(func)
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            token = _callback.set(label)
+            try:
+                with stage("total"):
+                    return await func(*args, **kwargs)
+            finally:
+                _callback.reset(token)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _callback.set(label)
+        try:
+            with stage("total"):
+                return func(*args, **kwargs)
+        finally:
+            _callback.reset(token)
+
+    return wrapper
+
+
+class CacheInfo(T.NamedTuple):
+    # The fields of the `cache_info()` of `functools.cache`
+    hits: int
+    misses: int
+    maxsize: int | None
+    currsize: int
+
+
+def cached(func: T.Callable[..., T.Any]) -> T.Callable[..., T.Any]:
+    """
+    A ``functools.cache`` that also counts its hits and misses.
+
+    ``cache_info()`` returns the hits, the misses and the size of the cache, as the one of
+    ``functools.cache``. ``cache_evict(match)`` removes the entries whose arguments satisfy
+    ``match(*args, **kwargs)`` and keeps the others, ``cache_clear()`` removes all of them.
+    """
+    cache: dict[T.Hashable, T.Any] = {}
+    # Bumped by the evictions: a value computed before an eviction is not stored
+    generation = [0]
+    hits_misses = [0, 0]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        try:
+            result = cache[key]
+        except KeyError:
+            pass
+        else:
+            hits_misses[0] += 1
+            record_cache(func.__name__, hit=True)
+            return result
+        hits_misses[1] += 1
+        record_cache(func.__name__, hit=False)
+        start = generation[0]
+        result = func(*args, **kwargs)
+        if generation[0] == start:
+            cache[key] = result
+        return result
+
+    def cache_evict(match: T.Callable[..., bool]) -> int:
+        generation[0] += 1
+        keys = [key for key in list(cache) if match(*key[0], **dict(key[1]))]
+        for key in keys:
+            cache.pop(key, None)
+        return len(keys)
+
+    def cache_clear() -> None:
+        generation[0] += 1
+        cache.clear()
+
+    def cache_info() -> CacheInfo:
+        return CacheInfo(hits_misses[0], hits_misses[1], None, len(cache))
+
+    register_cache(func.__name__, lambda: cache_info().currsize)
+    wrapper.cache_info = cache_info  # type: ignore[attr-defined]
+    wrapper.cache_evict = cache_evict  # type: ignore[attr-defined]
+    wrapper.cache_clear = cache_clear  # type: ignore[attr-defined]
+    return wrapper
+
+
+class HoloViews(pn.pane.HoloViews):
+    """
+    A HoloViews pane that records the HoloViews -> Bokeh conversion as the ``serialize`` stage.
+
+    The conversion happens after the callback returned, when panel attaches the pane to the document,
+    so the callback label is captured when the pane is created.
+    """
+
+    def __init__(self, object=None, **params):
+        self._callback_label = _callback.get()
+        super().__init__(object, **params)
+
+    def _get_model(self, doc, root=None, parent=None, comm=None):
+        with stage("serialize", self._callback_label):
+            return super()._get_model(doc, root, parent, comm)
+
+
+def summary() -> pd.DataFrame:
+    with _lock:
+        rows = [
+            dict(
+                callback=callback,
+                stage=name,
+                count=hist.count,
+                mean=hist.total / hist.count,
+                max=hist.max,
+                total=hist.total,
+            )
+            for (callback, name), hist in _durations.items()
+        ]
+    columns = ["callback", "stage", "count", "mean", "max", "total"]
+    return pd.DataFrame(rows, columns=columns).sort_values("total", ascending=False)
+
+
+def cache_summary() -> pd.DataFrame:
+    with _lock:
+        rows = [
+            dict(cache=name, result=result, count=count)
+            for (name, result), count in _cache_requests.items()
+        ]
+    df = pd.DataFrame(rows, columns=["cache", "result", "count"])
+    df = df.pivot_table(index="cache", columns="result", values="count", fill_value=0)
+    df = df.reindex(columns=["hit", "miss"], fill_value=0).astype(int)
+    df["size"] = pd.Series(_sizes(), dtype="Int64").reindex(df.index)
+    return df
+
+
+def render_prometheus() -> str:
+    lines = [
+        "# HELP seareport_stage_duration_seconds Duration of the stages of the panel callbacks.",
+        "# TYPE seareport_stage_duration_seconds histogram",
+    ]
+    with _lock:
+        for (callback, name), hist in sorted(_durations.items()):
+            labels = f'callback="{callback}",stage="{name}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, hist.buckets):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f'seareport_stage_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}'
+                )
+            lines.append(
+                f"seareport_stage_duration_seconds_sum{{{labels}}} {hist.total}"
+            )
+            lines.append(
+                f"seareport_stage_duration_seconds_count{{{labels}}} {hist.count}"
+            )
+        lines.extend(
+            [
+                "# HELP seareport_cache_requests_total Lookups of the cached loaders.",
+                "# TYPE seareport_cache_requests_total counter",
+            ]
+        )
+        for (name, result), count in sorted(_cache_requests.items()):
+            lines.append(
+                f'seareport_cache_requests_total{{cache="{name}",result="{result}"}} {count}'
+            )
+    lines.extend(
+        [
+            "# HELP seareport_cache_entries Entries of the cached loaders.",
+            "# TYPE seareport_cache_entries gauge",
+        ]
+    )
+    for name, size in sorted(_sizes().items()):
+        lines.append(f'seareport_cache_entries{{cache="{name}"}} {size}')
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self) -> None:
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(render_prometheus())
+
+
+def profiling_panel(period: int = 5000) -> pn.viewable.Viewable:
+    stages = pn.widgets.Tabulator(
+        summary(), show_index=False, sizing_mode="stretch_width", disabled=True
+    )
+    caches = pn.widgets.Tabulator(
+        cache_summary(), sizing_mode="stretch_width", disabled=True
+    )
+
+    def refresh() -> None:
+        stages.value = summary()
+        caches.value = cache_summary()
+
+    pn.state.add_periodic_callback(refresh, period=period)
+    return pn.template.MaterialTemplate(
+        title="Profiling",
+        main=[
+            pn.pane.Markdown("## Callback stages (seconds)"),
+            stages,
+            pn.pane.Markdown("## Cache lookups"),
+            caches,
+        ],
+    )
@@ -0,0 +1,107 @@
+"""
+Multi-resolution min/max envelopes of the station time series.
+
+Each level holds the minimum, the maximum and the number of values of the series over fixed time
+bins. A plot only needs about one bin per pixel, so it reads the finest level with at most
+``MAX_POINTS`` bins in its x-range. The full resolution series is only read when the counts of the
+finest level tell that the range is short enough.
+
+The levels are built ahead of time with the consolidated stores (``make store``, see
+``seareport_skill.store``), the levels of the stations that are not in a store are computed when
+they are first plotted.
+"""
+
+from __future__ import annotations
+
+import logging
+import pathlib
+import typing as T
+
+import numpy as np
+import pandas as pd
+
+from seareport_skill import arrow
+
+logger = logging.getLogger(__name__)
+
+# From the finest to the coarsest
+LEVELS = ("1h", "6h", "1D", "7D", "30D")
+COLUMNS = ("min", "max", "count")
+MAX_POINTS = 2000
+
+
+def level_path(parquet: pathlib.Path, level: str) -> pathlib.Path:
+    return (
+        arrow.ARROW_FOLDER
+        / "pyramid"
+        / parquet.parent.name
+        / parquet.stem
+        / f"{level}.arrow"
+    )
+
+
+def envelope(series: pd.Series, level: str) -> pd.DataFrame:
+    df = series.resample(level).agg(list(COLUMNS)).dropna()
+    # Stored with the values: float32 counts are exact up to 2**24 values per bin
+    return df.astype({"count": np.result_type(np.float32, series.dtype)})
+
+
+def _is_current(parquet: pathlib.Path, path: pathlib.Path) -> bool:
+    # Built from the current series, with all the columns: the levels without counts are rebuilt
+    return not arrow.is_stale(parquet, path) and set(COLUMNS) <= set(
+        arrow.read_table(path).column_names
+    )
+
+
+def build(parquet: pathlib.Path, series: pd.Series) -> dict[str, pathlib.Path]:
+    """
+    Write the levels of the series read from ``parquet`` in ``assets/arrow/pyramid``, unless they
+    are up to date. ``seareport_skill.store`` gathers them in one store per level.
+    """
+    paths = {level: level_path(parquet, level) for level in LEVELS}
+    if not all(_is_current(parquet, path) for path in paths.values()):
+        logger.info("Building the pyramid of %s", parquet)
+        for level, path in paths.items():
+            arrow.write_frame(envelope(series, level), path)
+    return paths
+
+
+def _count(index: pd.Index, start: T.Any, end: T.Any) -> int:
+    lo = 0 if start is None else index.searchsorted(start, side="left")
+    hi = len(index) if end is None else index.searchsorted(end, side="right")
+    return int(hi - lo)
+
+
+def _interleave(df: pd.DataFrame) -> pd.Series:
+    # min then max at the start of each bin: drawn as a line, the bins become vertical segments
+    values = np.column_stack([df["min"].to_numpy(), df["max"].to_numpy()]).ravel()
+    return pd.Series(values, index=df.index.repeat(2))
+
+
+def _first_bin(start: T.Any, level: str) -> pd.Timestamp | None:
+    # The bins are labelled by their start: include the bin containing `start`
+    return None if start is None else pd.Timestamp(start) - pd.Timedelta(level)
+
+
+def select(
+    read: T.Callable[[], pd.Series],
+    levels: T.Mapping[str, pd.DataFrame],
+    start: T.Any = None,
+    end: T.Any = None,
+    max_points: int = MAX_POINTS,
+) -> pd.Series:
+    """
+    Return the series between ``start`` and ``end`` at the finest resolution with at most
+    ``max_points`` points, the coarsest level otherwise.
+
+    ``read()`` returns the full resolution series between ``start`` and ``end``, it is only called
+    when the counts of the finest level, over the bins of the range, are at most ``max_points``.
+    """
+    finest = levels[LEVELS[0]]
+    if finest["count"].loc[_first_bin(start, LEVELS[0]) : end].sum() <= max_points:
+        return read()
+    for level in LEVELS:
+        df = levels[level]
+        if _count(df.index, start, end) * 2 <= max_points:
+            break
+    return _interleave(df.loc[_first_bin(start, level) : end, ["min", "max"]])
@@ -0,0 +1,237 @@
+"""
+SQL access to the stats with an embedded DuckDB database.
+
+The memory-mapped Arrow table of the stats is exposed as the ``stats`` view (one row per version and
+station) and its long form as the ``metrics`` view (one row per version, station and metric). DuckDB
+scans the Arrow buffers in place, the filters, projections and aggregations run in the database and
+only their result is converted to pandas. The metrics of the months and seasons (see
+``seareport_skill.periods``) are the ``periods`` view over the partitioned parquet files, only the
+partitions of the requested period are read.
+"""
+
+from __future__ import annotations
+
+import threading
+import typing as T
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from seareport_skill import arrow
+from seareport_skill import load_stats
+from seareport_skill import periods
+from seareport_skill import schema
+from seareport_skill import skill
+from seareport_skill.profiling import cached
+
+__all__: list[str] = [
+    "connect",
+    "describe",
+    "reset",
+    "select",
+]
+
+INDEX_COLUMNS = ["version", "station", "name", "ocean"]
+
+_local = threading.local()
+# Bumped by `reset`, the connections of an older generation are replaced
+_generation = 0
+
+
+@cached
+def load_table() -> pa.Table:
+    stats = load_stats()
+    table = arrow.read_table(arrow.arrow_path("model_stats"))
+    table = table.rename_columns(
+        [
+            "station" if name == "__index_level_0__" else name
+            for name in table.column_names
+        ]
+    )
+    # The regions are assigned when the stats are loaded
+    for column in ("name", "ocean"):
+        table = table.append_column(column, pa.array(stats[column]))
+    return table
+
+
+def connect() -> duckdb.DuckDBPyConnection:
+    """
+    Return the DuckDB connection of the current thread.
+    """
+    connection = getattr(_local, "connection", None)
+    if connection is not None and _local.generation != _generation:
+        connection.close()
+        connection = None
+    if connection is None:
+        connection = duckdb.connect()
+        connection.register("stats", load_table())
+        metrics = ", ".join(_quote(column) for column in _metric_columns())
+        connection.execute(
+            f"CREATE VIEW metrics AS UNPIVOT stats ON {metrics} INTO NAME metric VALUE value"
+        )
+        connection.execute(f"CREATE VIEW periods AS {_periods_source()}")
+        _local.connection = connection
+        _local.generation = _generation
+    return connection
+
+
+def reset() -> None:
+    """
+    Make every thread open a new connection, on the stats and periods as they are now.
+    """
+    global _generation
+    load_table.cache_clear()
+    _generation += 1
+
+
+def _periods_source() -> str:
+    if any(periods.PERIODS_FOLDER.glob("**/*.parquet")):
+        files = (periods.PERIODS_FOLDER / "**" / "*.parquet").as_posix()
+        return (
+            f"SELECT * FROM read_parquet('{files}', hive_partitioning = true, "
+            "hive_types = {'version': VARCHAR, 'period': VARCHAR})"
+        )
+    # Not built yet: the periods have no stats
+    metrics = ", ".join(f"NULL::FLOAT AS {_quote(m)}" for m in skill.METRICS)
+    return (
+        "SELECT NULL::VARCHAR AS version, NULL::VARCHAR AS period, "
+        f"NULL::VARCHAR AS station, {metrics} WHERE false"
+    )
+
+
+def _period_column(column: str) -> str:
+    if column in skill.METRICS:
+        return f"p.{_quote(column)}"
+    if column in INDEX_COLUMNS or column in schema.COORDINATES:
+        return f"s.{_quote(column)}"
+    # The storm metrics are not computed per period
+    return f"NULL::FLOAT AS {_quote(column)}"
+
+
+def _relation(period: str | None) -> str:
+    """
+    Return the stats of ``period`` (the ``stats`` view by default) with the columns of ``stats``.
+    """
+    if period is None:
+        return "stats"
+    if period not in periods.PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+    columns = ", ".join(_period_column(column) for column in load_table().column_names)
+    return f"""(
+        SELECT {columns} FROM stats s JOIN periods p
+        ON p.version = s.version AND p.station = s.station AND p.period = '{period}'
+    )"""
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _metric_columns() -> list[str]:
+    return [name for name in load_table().column_names if name not in INDEX_COLUMNS]
+
+
+def _as_list(value: str | T.Iterable[str]) -> list[str]:
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _where(
+    version: str | T.Iterable[str] | None,
+    stations: T.Iterable[str] | None,
+    region: str | T.Iterable[str] | None,
+) -> tuple[str, list[T.Any]]:
+    clauses: list[str] = []
+    params: list[T.Any] = []
+    if version is not None:
+        clauses.append("list_contains(?, version)")
+        params.append(_as_list(version))
+    if stations is not None:
+        clauses.append("list_contains(?, station)")
+        params.append(list(stations))
+    if region is not None:
+        clauses.append("(list_contains(?, ocean) OR list_contains(?, name))")
+        params += [_as_list(region)] * 2
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _bounded(column: str, bounds: tuple[float, float] | None) -> str:
+    if bounds is None:
+        return _quote(column)
+    column = _quote(column)
+    low, high = bounds
+    return f"CASE WHEN {column} > {low!r} AND {column} < {high!r} THEN {column} END"
+
+
+def select(
+    version: str | T.Iterable[str] | None = None,
+    metrics: T.Iterable[str] | None = None,
+    stations: T.Iterable[str] | None = None,
+    region: str | T.Iterable[str] | None = None,
+    bounds: tuple[float, float] | None = None,
+    period: str | None = None,
+) -> pd.DataFrame:
+    """
+    Return the stats matching the filters, indexed by station, with the compact dtypes of ``schema``.
+
+    The arguments are those of ``service.stats``. The values of the metrics outside of the open
+    interval ``bounds`` are replaced by NaN.
+    """
+    available = load_table().column_names
+    columns = [column for column in metrics or available if column != "station"]
+    unknown = set(columns) - set(available)
+    if unknown:
+        raise ValueError(f"Unknown columns: {sorted(unknown)}")
+    projection = ", ".join(
+        (
+            _quote(column)
+            if column in INDEX_COLUMNS
+            else f"{_bounded(column, bounds)} AS {_quote(column)}"
+        )
+        for column in columns
+    )
+    where, params = _where(version, stations, region)
+    relation = _relation(period)
+    sql = (
+        f"SELECT station, {projection} FROM {relation}{where} ORDER BY version, station"
+    )
+    df = connect().execute(sql, params).df().set_index("station").rename_axis(None)
+    return schema.compact(df)
+
+
+def describe(
+    metrics: T.Iterable[str],
+    version: str | T.Iterable[str] | None = None,
+    percentiles: T.Sequence[float] = (0.25, 0.5, 0.75),
+    bounds: tuple[float, float] | None = None,
+    period: str | None = None,
+) -> pd.DataFrame:
+    """
+    Same as ``DataFrame.groupby(["metric", "version"]).describe(percentiles)``, computed in the database.
+    """
+    source = "metrics"
+    if period is not None:
+        unpivot = ", ".join(_quote(column) for column in _metric_columns())
+        source = (
+            f"(UNPIVOT {_relation(period)} ON {unpivot} INTO NAME metric VALUE value)"
+        )
+    quantiles = ", ".join(
+        f"quantile_cont(value, {q!r}) AS {_quote(f'{q:.0%}')}" for q in percentiles
+    )
+    where, params = _where(version, None, None)
+    # The missing metrics are NaN in the Arrow file, not null: skip them as pandas does
+    value = (
+        "CASE WHEN isnan(value) THEN NULL ELSE value END"
+        if bounds is None
+        else _bounded("value", bounds)
+    )
+    sql = f"""
+        SELECT metric, version,
+            count(value) AS count, avg(value) AS mean, stddev_samp(value) AS std,
+            min(value) AS min, {quantiles}, max(value) AS max
+        FROM (SELECT metric, version, {value} AS value FROM {source}{where})
+        WHERE list_contains(?, metric)
+        GROUP BY metric, version
+        ORDER BY metric, version
+    """
+    return connect().execute(sql, params + [list(metrics)]).df()
@@ -0,0 +1,103 @@
+"""
+The compact in-memory representation of the stats.
+
+- the metrics are ``float32``: they are rounded skill scores, 7 significant digits are plenty;
+- the station coordinates stay ``float64``, they are tested against the region polygons;
+- ``version``, ``name`` (the maritime sector) and ``ocean`` are categoricals;
+- the index is a categorical of the station IDs: one small integer code per row, the labels are
+  stored once for all the versions.
+
+``python -mseareport_skill.schema`` prints the memory footprint of the stats of each version.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+__all__: list[str] = [
+    "compact",
+    "memory_usage",
+    "validate",
+]
+
+METRIC_DTYPE = np.dtype(np.float32)
+COORDINATES = ["obs_lat", "obs_lon", "mod_lat", "mod_lon"]
+CATEGORICALS = ["version", "name", "ocean"]
+
+
+def _expected(column: str) -> np.dtype | str:
+    if column in CATEGORICALS:
+        return "category"
+    if column in COORDINATES:
+        return np.dtype(np.float64)
+    return METRIC_DTYPE
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return ``df`` with the compact dtypes, the columns already compact are not copied.
+    """
+    dtypes = {
+        column: _expected(column)
+        for column, dtype in df.dtypes.items()
+        if not (dtype == _expected(column))
+    }
+    if dtypes:
+        df = df.astype(dtypes, copy=False)
+    if not isinstance(df.index, pd.CategoricalIndex):
+        df = df.set_axis(
+            pd.CategoricalIndex(df.index, categories=sorted(set(df.index))), copy=False
+        )
+    return df
+
+
+def validate(df: pd.DataFrame) -> None:
+    """
+    Raise a ``TypeError`` if the dtypes of ``df`` do not follow the compact schema.
+    """
+    wrong = {
+        column: str(dtype)
+        for column, dtype in df.dtypes.items()
+        if not (dtype == _expected(column))
+    }
+    if not isinstance(df.index, pd.CategoricalIndex):
+        wrong["index"] = str(df.index.dtype)
+    if wrong:
+        raise TypeError(f"The stats do not follow the compact schema: {wrong}")
+
+
+def memory_usage(df: pd.DataFrame) -> pd.Series:
+    """
+    Return the memory footprint in bytes of the stats of each version.
+
+    The categories (station IDs, regions) are counted once, in the ``categories`` row.
+    """
+    rows = df.groupby("version", observed=True).size()
+    codes = sum(
+        df[column].cat.codes.dtype.itemsize
+        for column in CATEGORICALS
+        if column in df.columns
+    )
+    codes += df.index.codes.dtype.itemsize
+    values = sum(
+        dtype.itemsize
+        for column, dtype in df.dtypes.items()
+        if column not in CATEGORICALS
+    )
+    usage = rows * (codes + values)
+    categories = sum(
+        df[column].cat.categories.memory_usage(deep=True)
+        for column in CATEGORICALS
+        if column in df.columns
+    )
+    categories += df.index.categories.memory_usage(deep=True)
+    return pd.concat([usage, pd.Series({"categories": categories})])
+
+
+if __name__ == "__main__":
+    from seareport_skill import load_stats
+
+    stats = load_stats()
+    usage = memory_usage(stats)
+    print(usage.to_string())
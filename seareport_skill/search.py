@@ -0,0 +1,166 @@
+"""
+Search of the stations by ID, maritime sector, ocean and country.
+
+The searched texts (the fields and each of their words, lower-cased) are sorted once: the prefix
+matches are a bisection. The fuzzy matches compare the trigrams of the query with those of the
+texts through an inverted index, so a query only touches the texts sharing a trigram with it.
+The widgets of the apps ask for the ``k`` best matches instead of receiving every station.
+"""
+
+from __future__ import annotations
+
+import collections
+import json
+import typing as T
+
+import numpy as np
+import pandas as pd
+import tornado.web
+
+__all__: list[str] = [
+    "SearchHandler",
+    "StationSearch",
+]
+
+FIELDS = ("station", "name", "ocean", "country")
+# Matches on the station ID rank above the same kind of match on the other fields
+FIELD_BONUS = {"station": 0.5, "name": 0.0, "ocean": 0.0, "country": 0.0}
+EXACT = 3.0
+PREFIX = 2.0
+# Minimum Dice coefficient of the trigrams for a fuzzy match
+FUZZY_THRESHOLD = 0.5
+MAX_K = 100
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class StationSearch:
+    """
+    Prefix and fuzzy search over the ``station`` ID (the index of ``records``) and the ``name``,
+    ``ocean`` and ``country`` columns.
+    """
+
+    def __init__(self, records: pd.DataFrame) -> None:
+        self.records = records.rename_axis("station")
+        # The ties are broken by station ID
+        self._rank = np.argsort(
+            np.argsort(self.records.index.astype(str), kind="stable")
+        )
+        postings: dict[str, dict[int, float]] = collections.defaultdict(dict)
+        columns = {"station": self.records.index.astype(str)}
+        columns.update(
+            {field: self.records[field] for field in FIELDS if field != "station"}
+        )
+        for field, values in columns.items():
+            for position, value in enumerate(values):
+                if not isinstance(value, str) or not value:
+                    continue
+                text = _normalize(value)
+                for key in {text, *text.split()}:
+                    bonus = postings[key].get(position, -1.0)
+                    postings[key][position] = max(bonus, FIELD_BONUS[field])
+        # The texts, sorted for the bisection, and their postings in CSR layout
+        self._keys = np.array(sorted(postings), dtype=object)
+        lengths = [len(postings[key]) for key in self._keys]
+        self._offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.intp)
+        self._stations = np.fromiter(
+            (p for key in self._keys for p in postings[key]), np.intp, sum(lengths)
+        )
+        self._bonus = np.fromiter(
+            (b for key in self._keys for b in postings[key].values()),
+            np.float64,
+            sum(lengths),
+        )
+        trigrams: dict[str, list[int]] = collections.defaultdict(list)
+        for i, key in enumerate(self._keys):
+            for trigram in _trigrams(key):
+                trigrams[trigram].append(i)
+        self._trigrams = {
+            trigram: np.array(keys, dtype=np.intp) for trigram, keys in trigrams.items()
+        }
+        self._ntrigrams = np.array([len(_trigrams(key)) for key in self._keys])
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _score(self, scores: np.ndarray, keys: np.ndarray, values: np.ndarray) -> None:
+        # Each station keeps the best score of all its matching texts
+        counts = self._offsets[keys + 1] - self._offsets[keys]
+        postings = np.concatenate(
+            [np.arange(self._offsets[k], self._offsets[k + 1]) for k in keys]
+            or [np.array([], dtype=np.intp)]
+        )
+        np.maximum.at(
+            scores,
+            self._stations[postings],
+            np.repeat(values, counts) + self._bonus[postings],
+        )
+
+    def search(
+        self, query: str, k: int = 10, among: T.Iterable[str] | None = None
+    ) -> pd.DataFrame:
+        """
+        Return the ``k`` best matches of ``query``, best first, with their ``score``.
+
+        An exact match ranks above a prefix match, which ranks above a fuzzy match. ``among``
+        restricts the results to some stations.
+        """
+        query = _normalize(query)
+        scores = np.full(len(self), -np.inf)
+        if query:
+            lo = np.searchsorted(self._keys, query, side="left")
+            hi = np.searchsorted(self._keys, query + "\uffff", side="left")
+            keys = np.arange(lo, hi)
+            lengths = np.array([len(key) for key in self._keys[keys]])
+            values = np.where(
+                lengths == len(query), EXACT, PREFIX + len(query) / lengths
+            )
+            self._score(scores, keys, values)
+            query_trigrams = _trigrams(query)
+            matches = [self._trigrams[t] for t in query_trigrams if t in self._trigrams]
+            if matches:
+                common = np.bincount(np.concatenate(matches), minlength=len(self._keys))
+                dice = 2 * common / (len(query_trigrams) + self._ntrigrams)
+                keys = np.flatnonzero(dice >= FUZZY_THRESHOLD)
+                self._score(scores, keys, dice[keys])
+        if among is not None:
+            scores[~self.records.index.isin(list(among))] = -np.inf
+        found = np.flatnonzero(np.isfinite(scores))
+        # Best score first, then by station ID
+        order = np.lexsort((self._rank[found], -scores[found]))
+        found = found[order[:k]]
+        return self.records.iloc[found].assign(score=scores[found])
+
+
+class SearchHandler(tornado.web.RequestHandler):
+    """
+    ``GET /search?q=<query>&k=<count>[&version=<version>]`` returns the best matches as JSON.
+    """
+
+    def get(self) -> None:
+        from seareport_skill import service
+
+        query = self.get_argument("q", "")
+        try:
+            k = int(self.get_argument("k", "10"))
+        except ValueError:
+            raise tornado.web.HTTPError(400, "k must be an integer")
+        if k < 1:
+            raise tornado.web.HTTPError(400, "k must be at least 1")
+        k = min(k, MAX_K)
+        version = self.get_argument("version", None)
+        try:
+            results = service.search_stations(query, k=k, version=version)
+        except KeyError:
+            raise tornado.web.HTTPError(404, f"Unknown version: {version}")
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        records = results.reset_index().astype(object)
+        records = records.where(records.notna(), None)
+        self.write(json.dumps({"query": query, "results": records.to_dict("records")}))
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import logging
+import pathlib
+import threading
+import typing as T
+
+import panel as pn
+
+from seareport_skill import api
+from seareport_skill import profiling
+from seareport_skill import search
+from seareport_skill import warmup
+from seareport_skill import watcher
+
+logger = logging.getLogger(__name__)
+
+
+def get_apps(files: list[str]) -> dict[str, T.Any]:
+    # Same slugs as `panel serve *app.py`
+    return {pathlib.Path(file).stem: file for file in files}
+
+
+def get_extra_patterns(metrics: bool) -> list[tuple[T.Any, ...]]:
+    patterns: list[tuple[T.Any, ...]] = [
+        (r"/search", search.SearchHandler),
+        (r"/stats", api.StatsHandler),
+    ]
+    if metrics:
+        patterns.append((r"/metrics", profiling.MetricsHandler))
+    return patterns
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Serve the skill panel apps")
+    parser.add_argument(
+        "files", nargs="*", help="The apps to serve, defaults to *app.py"
+    )
+    parser.add_argument("--port", type=int, default=5006)
+    parser.add_argument("--address", default=None)
+    parser.add_argument("--allow-websocket-origin", action="append", default=[])
+    parser.add_argument("--use-xheaders", action="store_true")
+    parser.add_argument(
+        "--num-procs",
+        type=int,
+        default=1,
+        help="Number of worker processes, 0 means one per CPU",
+    )
+    parser.add_argument(
+        "--num-threads",
+        type=int,
+        default=None,
+        help="Size of the thread pool running the callbacks of each process, defaults to one per CPU",
+    )
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="Fill the caches and render the apps once before the workers are started",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Reload the data when the files of assets/ and 01_obs/ change, without restarting",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Expose /metrics in Prometheus text format and the /profiling panel",
+    )
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = get_parser().parse_args(argv)
+    files = args.files or sorted(glob.glob("*app.py"))
+    apps = get_apps(files)
+    if args.num_threads is not None:
+        pn.config.nthreads = args.num_threads
+    if args.metrics:
+        apps["profiling"] = profiling.profiling_panel
+    if args.watch:
+        # Each worker starts its watcher with its first session, after the fork
+        watcher.enable()
+    if args.preload:
+        # Runs before the workers are forked: the memory-mapped frames are shared by all of them.
+        # Only the data: an event loop started in the parent breaks the sockets of the workers
+        warmup.warm_caches()
+    server = pn.serve(
+        apps,
+        port=args.port,
+        address=args.address,
+        websocket_origin=args.allow_websocket_origin or None,
+        use_xheaders=args.use_xheaders,
+        extra_patterns=get_extra_patterns(args.metrics),
+        num_procs=args.num_procs,
+        show=False,
+        start=False,
+    )
+    # From here on, each worker runs its own copy of the code below
+    if args.preload:
+        # The sessions are served while the apps render
+        threading.Thread(
+            target=warmup.render_apps, args=(files,), name="warmup", daemon=True
+        ).start()
+    server.start()
+    server.io_loop.start()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+The data access layer shared by all the apps.
+
+Every query is answered from the memory-mapped Arrow files of ``assets/arrow``: the processes
+serving the apps hold a single copy of the data and all the apps see the same values.
+"""
+
+from __future__ import annotations
+
+import pathlib
+import typing as T
+
+import geopandas as gp
+import pandas as pd
+
+from seareport_skill import arrow
+from seareport_skill import find_countries
+from seareport_skill import geo
+from seareport_skill import load_model_stats
+from seareport_skill import load_regions
+from seareport_skill import load_stats
+from seareport_skill import periods
+from seareport_skill import pyramid
+from seareport_skill import query
+from seareport_skill import search
+from seareport_skill import spatial
+from seareport_skill import store
+from seareport_skill import windows
+from seareport_skill.profiling import cached
+
+__all__: list[str] = [
+    "envelope",
+    "fingerprint",
+    "regions",
+    "search_stations",
+    "station_index",
+    "stats",
+    "timeseries",
+    "timeseries_frame",
+    "window_stats",
+]
+
+# The files the stats are computed from: the stats, the regions and the stats of the periods
+ASSETS = (arrow.arrow_path("model_stats"), geo.REGIONS, periods.PERIODS_FOLDER)
+
+
+def fingerprint() -> str:
+    """
+    Return a hash of the content of the assets of the stats, it changes when they are rebuilt.
+    """
+    return arrow.fingerprint(ASSETS)
+
+
+def stats(
+    version: str | T.Iterable[str] | None = None,
+    metrics: T.Iterable[str] | None = None,
+    stations: T.Iterable[str] | None = None,
+    region: str | T.Iterable[str] | None = None,
+    bounds: tuple[float, float] | None = None,
+    period: str | None = None,
+) -> pd.DataFrame:
+    """
+    Return the stats of the stations, indexed by station.
+
+    ``version`` is one model version or several of them, all of them by default; the ``version``
+    column tells them apart. ``region`` matches either an ocean or a maritime sector. The frame
+    keeps the station coordinates and the ``version``, ``name`` and ``ocean`` columns unless
+    ``metrics`` selects the columns. The values outside of the open interval ``bounds`` are
+    replaced by NaN. ``period`` is a month (``"01"`` to ``"12"``) or a season (``"DJF"``, ``"MAM"``,
+    ``"JJA"``, ``"SON"``) of ``seareport_skill.periods``, the storm metrics of a period are NaN.
+
+    The stats of whole versions are views on the shared data and must not be modified in place,
+    the other queries run in DuckDB and only their result is materialized.
+    """
+    if (
+        metrics is None
+        and stations is None
+        and region is None
+        and bounds is None
+        and period is None
+    ):
+        if isinstance(version, str):
+            return load_model_stats(version)
+        if version is None:
+            return load_stats()
+    return query.select(version, metrics, stations, region, bounds, period)
+
+
+@cached
+def _load_timeseries(path: pathlib.Path) -> pd.Series:
+    df = arrow.read_frame(arrow.build_timeseries(path))
+    return df[df.columns[0]]
+
+
+def timeseries(
+    station: str,
+    model: str | pathlib.Path,
+    window: tuple[T.Any, T.Any] | None = None,
+) -> pd.Series:
+    """
+    Return the time series of a station from the folder of a model (or of the observations).
+
+    ``window`` is a ``(start, end)`` pair of timestamps, both included, either one may be ``None``.
+    The series is read from the consolidated store of the model when it is built (see
+    ``seareport_skill.store``), from the file of the station otherwise. Either way, without its
+    missing values.
+    """
+    consolidated = store.open_store(model)
+    if consolidated is not None and station in consolidated:
+        return consolidated.series(station, window)
+    series = _load_timeseries(pathlib.Path(model) / f"{station}.parquet")
+    if window is not None:
+        start, end = window
+        series = series.loc[start:end]
+    return series.dropna()
+
+
+def timeseries_frame(
+    model: str | pathlib.Path,
+    stations: T.Iterable[str] | None = None,
+    window: tuple[T.Any, T.Any] | None = None,
+) -> pd.DataFrame:
+    """
+    Return the time series of several stations of a model (all of them by default) as columns.
+
+    The time series share the time axis of the consolidated store of the model when it is built,
+    otherwise the stations are read one by one and aligned on the union of their time steps.
+    """
+    stations = None if stations is None else list(stations)
+    consolidated = store.open_store(model)
+    if consolidated is not None and (
+        stations is None or all(station in consolidated for station in stations)
+    ):
+        return consolidated.frame(window, stations)
+    if stations is None:
+        stations = sorted(path.stem for path in pathlib.Path(model).glob("*.parquet"))
+    return pd.concat(
+        {station: timeseries(station, model, window) for station in stations}, axis=1
+    )
+
+
+def window_stats(
+    model: str | pathlib.Path, window: tuple[T.Any, T.Any] | None = None
+) -> pd.DataFrame:
+    """
+    Return the metrics of ``windows.METRICS`` of all the stations of a model over ``window``.
+
+    ``window`` is a ``(start, end)`` pair of timestamps, both included, either one may be ``None``.
+    Raise ``FileNotFoundError`` if the cumulative sums of the model are not built.
+    """
+    path = windows.windows_path(pathlib.Path(model))
+    if not path.exists():
+        raise FileNotFoundError(path)
+    start, end = window or (None, None)
+    return windows.window_stats(model, start, end)
+
+
+@cached
+def _load_pyramid(path: pathlib.Path) -> dict[str, pd.DataFrame]:
+    levels = store.envelopes(path.parent, path.stem)
+    if levels is None:
+        # Not built ahead of time with the store: computed, nothing is written while serving
+        series = timeseries(path.stem, path.parent)
+        levels = {level: pyramid.envelope(series, level) for level in pyramid.LEVELS}
+    return levels
+
+
+def envelope(
+    station: str,
+    model: str | pathlib.Path,
+    window: tuple[T.Any, T.Any] | None = None,
+    max_points: int = pyramid.MAX_POINTS,
+) -> pd.Series:
+    """
+    Same as ``timeseries`` but downsampled to at most ``max_points`` min/max points for plotting.
+
+    The time series is returned at full resolution when the window is short enough. Both are read
+    from the consolidated stores of the model when they are built.
+    """
+    path = pathlib.Path(model) / f"{station}.parquet"
+    start, end = window or (None, None)
+    # The counts of the levels tell whether the window is short enough, only then it is read
+    return pyramid.select(
+        lambda: timeseries(station, model, window),
+        _load_pyramid(path),
+        start,
+        end,
+        max_points,
+    )
+
+
+def regions() -> gp.GeoDataFrame:
+    """
+    Return the oceans and maritime sectors, with their spatial index.
+    """
+    return load_regions()
+
+
+@cached
+def station_index(version: str | None = None) -> spatial.StationIndex:
+    """
+    Return the spatial index of the stations of a model version, of all the versions by default.
+    """
+    return spatial.StationIndex.from_stats(stats(version))
+
+
+@cached
+def _station_search(version: str | None = None) -> search.StationSearch:
+    records = stats(version)
+    records = records[~records.index.duplicated()]
+    countries = find_countries(records["obs_lon"], records["obs_lat"])
+    return search.StationSearch(
+        records[["name", "ocean"]].assign(country=countries.to_numpy())
+    )
+
+
+def search_stations(
+    text: str,
+    k: int = 10,
+    version: str | None = None,
+    among: T.Iterable[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Return the ``k`` stations best matching ``text`` by ID, maritime sector, ocean or country.
+
+    The stations of a model version, of all the versions by default, optionally restricted to the
+    stations ``among``. Prefix matches rank above the fuzzy matches, the frame is indexed by
+    station and has a ``score`` column.
+    """
+    return _station_search(version).search(text, k, among)
@@ -4,7 +4,6 @@ import colorcet as cc
 
 # Constants and configuration
 SURGE_FOLDER = "./obs/surge/"
-STATS_JSON = "assets/stats_all.json"
 TMIN = "2023-01-01"
 TMAX = "2023-12-31"
 VERSIONS = {
@@ -15,6 +14,27 @@ VERSIONS = {
     "Global 3km, L6 GSSHS": "v2.2",
 }
 
+# The months and seasons of seareport_skill.periods, None is the whole time series
+PERIODS = {
+    "Whole period": None,
+    "Winter (DJF)": "DJF",
+    "Spring (MAM)": "MAM",
+    "Summer (JJA)": "JJA",
+    "Autumn (SON)": "SON",
+    "January": "01",
+    "February": "02",
+    "March": "03",
+    "April": "04",
+    "May": "05",
+    "June": "06",
+    "July": "07",
+    "August": "08",
+    "September": "09",
+    "October": "10",
+    "November": "11",
+    "December": "12",
+}
+
 PLOT_OPTS = {
     "ts_view": dict(width=1000, height=600),
     "taylor_view": dict(width=700, height=700),
@@ -0,0 +1,211 @@
+"""
+Skill metrics of several models against the same observations, in one vectorized pass.
+
+The model series are aligned to the observations once, as with ``seastats.align_ts``, into 2-D arrays
+with one column per model and NaN where a model or the observations have no value. The metrics are
+the general metrics of ``seastats.get_stats`` (the storm metrics come from the matched storms, see
+``seareport_skill.extremes``) and are computed with NaN-aware reductions along the time axis.
+"""
+
+from __future__ import annotations
+
+import functools
+import typing as T
+import warnings
+
+import numpy as np
+import pandas as pd
+
+__all__: list[str] = [
+    "align",
+    "column",
+    "compute_stats",
+    "get_stats",
+    "METRICS",
+]
+
+METRICS = [
+    "bias",
+    "rmse",
+    "rms",
+    "rms_95",
+    "sim_mean",
+    "obs_mean",
+    "sim_std",
+    "obs_std",
+    "nse",
+    "lamba",
+    "cr",
+    "cr_95",
+    "slope",
+    "intercept",
+    "slope_pp",
+    "intercept_pp",
+    "mad",
+    "madp",
+    "madc",
+    "kge",
+]
+PERCENTILES = np.arange(0, 0.99, 0.01)
+
+
+def _truncate_seconds(ts: pd.Series) -> pd.Series:
+    # Keep the first value of each minute
+    ts = ts.set_axis(ts.index.floor("min"))
+    return ts[~ts.index.duplicated()]
+
+
+def align(
+    sims: T.Mapping[str, pd.Series], obs: pd.Series
+) -> tuple[pd.Index, np.ndarray, np.ndarray]:
+    """
+    Return the shared time axis and the ``(time, model)`` arrays of the observations and the models.
+
+    The observations are resampled to the median time step of each model, only once per time step.
+    The models come first, as the ``sim`` of ``seastats.align_ts``.
+    """
+    if not isinstance(sims, T.Mapping):
+        raise TypeError(f"sims must be a mapping of the model series, not {type(sims)}")
+    if not isinstance(obs, pd.Series):
+        raise TypeError(f"obs must be a pandas.Series, not {type(obs)}")
+    if not sims:
+        return pd.DatetimeIndex([]), np.empty((0, 0)), np.empty((0, 0))
+    obs = _truncate_seconds(obs.dropna())
+    resampled: dict[pd.Timedelta, pd.Series] = {}
+    pairs = []
+    for sim in sims.values():
+        step = pd.Timedelta(sim.index.to_series().diff().median())
+        if step not in resampled:
+            resampled[step] = obs.resample(step).mean()
+        pairs.append((sim, resampled[step]))
+    index = functools.reduce(
+        pd.Index.union, [s.index for pair in pairs for s in pair], pd.DatetimeIndex([])
+    )
+    sim_values = np.column_stack(
+        [sim.reindex(index).to_numpy(np.float64) for sim, _ in pairs]
+    )
+    obs_values = np.column_stack(
+        [obs_.reindex(index).to_numpy(np.float64) for _, obs_ in pairs]
+    )
+    invalid = np.isnan(sim_values) | np.isnan(obs_values)
+    sim_values[invalid] = np.nan
+    obs_values[invalid] = np.nan
+    return index, sim_values, obs_values
+
+
+def column(
+    index: pd.Index, sim: np.ndarray, obs: np.ndarray, i: int
+) -> tuple[pd.Series, pd.Series]:
+    """
+    Return the aligned series of the ``i``-th model, as returned by ``seastats.align_ts``.
+    """
+    valid = ~np.isnan(sim[:, i])
+    return (
+        pd.Series(sim[valid, i], index=index[valid]),
+        pd.Series(obs[valid, i], index=index[valid]),
+    )
+
+
+def _std(values: np.ndarray) -> np.ndarray:
+    return np.nanstd(values, axis=0, ddof=1)
+
+
+def _corr(sim: np.ndarray, obs: np.ndarray) -> np.ndarray:
+    # Pearson correlation over the times where both are defined, as pandas.Series.corr
+    invalid = np.isnan(sim) | np.isnan(obs)
+    sim = np.where(invalid, np.nan, sim)
+    obs = np.where(invalid, np.nan, obs)
+    sim_anomaly = sim - np.nanmean(sim, axis=0)
+    obs_anomaly = obs - np.nanmean(obs, axis=0)
+    return np.nansum(sim_anomaly * obs_anomaly, axis=0) / np.sqrt(
+        np.nansum(sim_anomaly**2, axis=0) * np.nansum(obs_anomaly**2, axis=0)
+    )
+
+
+def _slope_intercept(sim: np.ndarray, obs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    sim_mean = np.nanmean(sim, axis=0)
+    obs_mean = np.nanmean(obs, axis=0)
+    slope = np.nansum((obs - obs_mean) * (sim - sim_mean), axis=0) / np.nansum(
+        (obs - obs_mean) ** 2, axis=0
+    )
+    return slope, sim_mean - slope * obs_mean
+
+
+def _rms(sim: np.ndarray, obs: np.ndarray) -> np.ndarray:
+    centered = (sim - np.nanmean(sim, axis=0)) - (obs - np.nanmean(obs, axis=0))
+    return np.sqrt(np.nanmean(centered**2, axis=0))
+
+
+def _compute(sim: np.ndarray, obs: np.ndarray) -> dict[str, np.ndarray]:
+    stats: dict[str, np.ndarray] = {}
+    sim_mean = np.nanmean(sim, axis=0)
+    obs_mean = np.nanmean(obs, axis=0)
+    sim_std = _std(sim)
+    obs_std = _std(obs)
+    error = obs - sim
+    stats["bias"] = sim_mean - obs_mean
+    stats["rmse"] = np.sqrt(np.nanmean(error**2, axis=0))
+    stats["rms"] = _rms(sim, obs)
+    stats["sim_mean"] = sim_mean
+    stats["obs_mean"] = obs_mean
+    stats["sim_std"] = sim_std
+    stats["obs_std"] = obs_std
+    stats["nse"] = 1 - np.nansum(error**2, axis=0) / np.nansum(
+        (obs - obs_mean) ** 2, axis=0
+    )
+    cr = _corr(sim, obs)
+    stats["cr"] = cr
+    covariance = np.nansum((obs - obs_mean) * (sim - sim_mean), axis=0)
+    kappa = np.where(cr >= 0, 0.0, 2 * np.abs(covariance))
+    stats["lamba"] = 1 - np.nansum(error**2, axis=0) / (
+        np.nansum((obs - obs_mean) ** 2, axis=0)
+        + np.nansum((sim - sim_mean) ** 2, axis=0)
+        + np.sum(~np.isnan(obs), axis=0) * (obs_mean - sim_mean) ** 2
+        + kappa
+    )
+    stats["slope"], stats["intercept"] = _slope_intercept(sim, obs)
+    sim_percentiles = np.nanquantile(sim, PERCENTILES, axis=0)
+    obs_percentiles = np.nanquantile(obs, PERCENTILES, axis=0)
+    stats["slope_pp"], stats["intercept_pp"] = _slope_intercept(
+        sim_percentiles, obs_percentiles
+    )
+    stats["mad"] = _std(np.abs(error))
+    stats["madp"] = _std(np.abs(obs_percentiles - sim_percentiles))
+    stats["madc"] = stats["mad"] + stats["madp"]
+    stats["kge"] = 1 - np.sqrt(
+        (cr - 1) ** 2
+        + ((sim_mean - obs_mean) / obs_std) ** 2
+        + (sim_std / obs_std - 1) ** 2
+    )
+    # Above the 95th percentile of each series, as `get_stats(..., quantile=0.95)`
+    sim_95 = np.where(sim > np.nanquantile(sim, 0.95, axis=0), sim, np.nan)
+    obs_95 = np.where(obs > np.nanquantile(obs, 0.95, axis=0), obs, np.nan)
+    stats["rms_95"] = _rms(sim_95, obs_95)
+    stats["cr_95"] = _corr(sim_95, obs_95)
+    return stats
+
+
+def compute_stats(sim: np.ndarray, obs: np.ndarray, models: list[str]) -> pd.DataFrame:
+    """
+    Return the metrics of the aligned ``(time, model)`` arrays returned by ``align``.
+    """
+    if sim.shape != obs.shape or sim.ndim != 2 or sim.shape[1] != len(models):
+        raise ValueError(
+            f"Expected two (time, model) arrays for {len(models)} models, got {sim.shape} and {obs.shape}"
+        )
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        # Models without any value in common with the observations get NaN
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        stats = _compute(sim, obs)
+    return pd.DataFrame(stats, index=models)[METRICS]
+
+
+def get_stats(sims: T.Mapping[str, pd.Series], obs: pd.Series) -> pd.DataFrame:
+    """
+    Return the metrics of each model (rows) against the observations.
+
+    Same values as ``seastats.get_stats`` on the series aligned with ``seastats.align_ts``, model by
+    model, up to floating point rounding.
+    """
+    _, sim, obs_ = align(sims, obs)
+    return compute_stats(sim, obs_, list(sims))
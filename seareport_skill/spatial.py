@@ -0,0 +1,128 @@
+"""
+Spatial index of the stations.
+
+The stations are stored in a KD-tree on their positions on the unit sphere. The chord between two
+points grows with their great-circle distance, so the nearest stations and the stations within a
+radius in 3-D are the same as with the haversine distance, without any distortion near the poles
+or the antimeridian.
+"""
+
+from __future__ import annotations
+
+import typing as T
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+__all__: list[str] = [
+    "haversine",
+    "StationIndex",
+]
+
+# Mean radius of the Earth, in km
+EARTH_RADIUS = 6371.0088
+
+
+def _unit_vectors(lon: T.Any, lat: T.Any) -> np.ndarray:
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    return np.stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1
+    )
+
+
+def _chord(distance: T.Any) -> T.Any:
+    return 2 * np.sin(np.asarray(distance) / EARTH_RADIUS / 2)
+
+
+def _arc(chord: T.Any) -> T.Any:
+    return 2 * EARTH_RADIUS * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def haversine(lon1: T.Any, lat1: T.Any, lon2: T.Any, lat2: T.Any) -> T.Any:
+    """
+    Return the great-circle distance in km between two points (or arrays of points).
+    """
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+class StationIndex:
+    """
+    Nearest-station, radius and bounding box queries on the stations.
+
+    The distances are in km, the bounding boxes are ``(west, south, east, north)`` in degrees and
+    cross the antimeridian when ``west > east``.
+    """
+
+    def __init__(self, stations: T.Sequence[str], lon: T.Any, lat: T.Any) -> None:
+        self.stations = pd.Index(stations)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self._tree = cKDTree(_unit_vectors(self.lon, self.lat))
+        # The bounding box queries bisect the longitudes
+        self._by_lon = np.argsort(self.lon, kind="stable")
+        self._sorted_lon = self.lon[self._by_lon]
+
+    @classmethod
+    def from_stats(cls, stats: pd.DataFrame) -> StationIndex:
+        stats = stats[~stats.index.duplicated()]
+        return cls(stats.index, stats["obs_lon"], stats["obs_lat"])
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def nearest(self, lon: float, lat: float, k: int = 1) -> pd.Series:
+        """
+        Return the distance to the ``k`` stations nearest to a point, nearest first.
+        """
+        k = min(k, len(self))
+        if k == 0:
+            return pd.Series([], index=self.stations[:0], dtype=np.float64)
+        chords, positions = self._tree.query(
+            _unit_vectors(lon, lat), k=[*range(1, k + 1)]
+        )
+        return pd.Series(_arc(chords), index=self.stations[positions])
+
+    def nearest_each(self, lon: T.Any, lat: T.Any) -> tuple[pd.Index, np.ndarray]:
+        """
+        Return the station nearest to each of the points and its distance.
+        """
+        chords, positions = self._tree.query(_unit_vectors(lon, lat))
+        return self.stations[positions], _arc(chords)
+
+    def within(self, lon: float, lat: float, radius: float) -> pd.Series:
+        """
+        Return the distance to the stations within ``radius`` km of a point, nearest first.
+        """
+        point = _unit_vectors(lon, lat)
+        positions = np.asarray(
+            self._tree.query_ball_point(
+                point, _chord(min(radius, np.pi * EARTH_RADIUS))
+            ),
+            dtype=np.intp,
+        )
+        distances = _arc(np.linalg.norm(self._tree.data[positions] - point, axis=1))
+        order = np.argsort(distances, kind="stable")
+        return pd.Series(distances[order], index=self.stations[positions[order]])
+
+    def within_bbox(
+        self, west: float, south: float, east: float, north: float
+    ) -> pd.Index:
+        """
+        Return the stations within a bounding box, in the order of the index.
+        """
+        lo = np.searchsorted(self._sorted_lon, west, side="left")
+        hi = np.searchsorted(self._sorted_lon, east, side="right")
+        if west <= east:
+            positions = self._by_lon[lo:hi]
+        else:
+            positions = np.concatenate([self._by_lon[lo:], self._by_lon[:hi]])
+        lat = self.lat[positions]
+        positions = np.sort(positions[(lat >= south) & (lat <= north)])
+        return self.stations[positions]
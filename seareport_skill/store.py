@@ -0,0 +1,437 @@
+"""
+Consolidated storage of the time series of all the stations of a model.
+
+Instead of one file per station, the series of a model folder (or of the observations) are a single
+2-D array of ``(time, station)`` on the union of their time steps, NaN where a station has no value
+(the values are stored as floats for that reason). Two backends are available, with the same reader
+interface (``Store``):
+
+- ``arrow``: one uncompressed Arrow IPC file with a ``time`` column and one column per station,
+  written in record batches of ``TIME_CHUNK`` rows. It is memory-mapped: a station is one column,
+  a time slice is a slice of the batches;
+- ``zarr``: one Zarr group with chunks of ``TIME_CHUNK`` time steps by ``STATION_CHUNK`` stations,
+  so that reading one station or one time slice of all the stations touches few chunks. The store is
+  a symbolic link to the group, written in ``VERSIONS_FOLDER``: a rebuild replaces the link at once,
+  and the readers of the previous group keep it until the next rebuild.
+
+Each store comes with the levels of the min/max pyramid of its stations (see
+``seareport_skill.pyramid``), one store per level with the ``<station>/min``, ``<station>/max`` and
+``<station>/count`` columns.
+
+``python -mseareport_skill.store [--backend zarr]`` builds the stores in ``assets/arrow/store``;
+``service.timeseries`` and ``service.envelope`` read the stations from the stores of a model when
+there are some.
+"""
+
+from __future__ import annotations
+
+import abc
+import argparse
+import logging
+import os
+import pathlib
+import shutil
+import time
+import typing as T
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from seareport_skill import arrow
+from seareport_skill import pyramid
+from seareport_skill.extremes import MODELS_FOLDER
+from seareport_skill.extremes import OBSERVED
+from seareport_skill.profiling import cached
+
+logger = logging.getLogger(__name__)
+
+__all__: list[str] = [
+    "build",
+    "envelopes",
+    "open_pyramid",
+    "open_store",
+    "Store",
+]
+
+BACKENDS = ("arrow", "zarr")
+STORE_FOLDER = arrow.ARROW_FOLDER / "store"
+# The Zarr groups the stores link to
+VERSIONS_FOLDER = STORE_FOLDER / ".versions"
+TIME_CHUNK = 2**14
+STATION_CHUNK = 16
+
+
+def store_path(folder: pathlib.Path, backend: str) -> pathlib.Path:
+    return STORE_FOLDER / f"{folder.name}.{backend}"
+
+
+def pyramid_path(folder: pathlib.Path, level: str, backend: str) -> pathlib.Path:
+    return STORE_FOLDER / f"{folder.name}.pyramid" / f"{level}.{backend}"
+
+
+def _stamp(version: pathlib.Path) -> int:
+    return int(version.suffix[1:])
+
+
+def _versions(target: pathlib.Path) -> list[pathlib.Path]:
+    # The groups written for the store `target`, from the oldest to the latest
+    folder = VERSIONS_FOLDER / target.relative_to(STORE_FOLDER).parent
+    return sorted(folder.glob(f"{target.name}.*[0-9]"), key=_stamp)
+
+
+class Station(T.NamedTuple):
+    # Memory-mapped: only the pages of the rows being written are read
+    times: np.ndarray
+    values: np.ndarray
+    name: str
+
+
+class Store(abc.ABC):
+    """
+    Reader of the series of a consolidated store, whatever its backend.
+    """
+
+    def __init__(self, stations: T.Sequence[str], times: T.Any, name: str) -> None:
+        self.stations = pd.Index(stations)
+        self.times = pd.DatetimeIndex(times)
+        self.name = name
+        self._positions = pd.Series(np.arange(len(self.stations)), index=self.stations)
+
+    def __contains__(self, station: str) -> bool:
+        return station in self._positions.index
+
+    @abc.abstractmethod
+    def _read(self, rows: slice, columns: np.ndarray) -> np.ndarray:
+        """
+        Return the values of the ``rows`` of the store (times) and of the ``columns`` (stations).
+        """
+
+    def _rows(self, window: tuple[T.Any, T.Any] | None) -> slice:
+        # Same bounds as `.loc[start:end]`, partial dates included
+        start, end = window or (None, None)
+        return self.times.slice_indexer(start, end)
+
+    def series(
+        self, station: str, window: tuple[T.Any, T.Any] | None = None
+    ) -> pd.Series:
+        """
+        Return the series of a station, without its missing values.
+        """
+        rows = self._rows(window)
+        values = self._read(rows, np.array([self._positions[station]]))[:, 0]
+        valid = ~np.isnan(values)
+        return pd.Series(values[valid], index=self.times[rows][valid], name=self.name)
+
+    def frame(
+        self,
+        window: tuple[T.Any, T.Any] | None = None,
+        stations: T.Iterable[str] | None = None,
+    ) -> pd.DataFrame:
+        """
+        Return the series of the stations (columns) on the shared time axis.
+        """
+        rows = self._rows(window)
+        columns = (
+            np.arange(len(self.stations))
+            if stations is None
+            else self._positions[list(stations)].to_numpy()
+        )
+        return pd.DataFrame(
+            self._read(rows, columns),
+            index=self.times[rows],
+            columns=self.stations[columns],
+        )
+
+
+class ArrowStore(Store):
+    def __init__(self, path: pathlib.Path) -> None:
+        self._table = arrow.read_table(path)
+        times = self._table.column("time").to_numpy()
+        super().__init__(
+            self._table.column_names[1:],
+            times,
+            self._table.schema.metadata[b"name"].decode(),
+        )
+
+    def _read(self, rows: slice, columns: np.ndarray) -> np.ndarray:
+        table = self._table.slice(rows.start, rows.stop - rows.start)
+        values = [table.column(int(column) + 1).to_numpy() for column in columns]
+        return np.column_stack(values) if values else np.empty((len(table), 0))
+
+
+class ZarrStore(Store):
+    def __init__(self, path: pathlib.Path) -> None:
+        import zarr
+
+        # The group the link points to now: a rebuild does not change what this reader sees
+        group = zarr.open_group(str(path.resolve()), mode="r")
+        self._values = group["values"]
+        super().__init__(group["station"][:], group["time"][:], group.attrs["name"])
+
+    def _read(self, rows: slice, columns: np.ndarray) -> np.ndarray:
+        return self._values.get_orthogonal_selection((rows, columns))
+
+
+READERS: dict[str, type[Store]] = {"arrow": ArrowStore, "zarr": ZarrStore}
+
+
+@cached
+def _open(folder: pathlib.Path, backend: str, level: str | None = None) -> Store:
+    if level is None:
+        return READERS[backend](store_path(folder, backend))
+    return READERS[backend](pyramid_path(folder, level, backend))
+
+
+def open_store(folder: str | pathlib.Path) -> Store | None:
+    """
+    Return the reader of the store of a model folder, ``None`` if it is not built.
+    """
+    folder = pathlib.Path(folder)
+    for backend in BACKENDS:
+        # Not cached when missing: a store built later is picked up
+        if store_path(folder, backend).exists():
+            return _open(folder, backend)
+    return None
+
+
+def open_pyramid(folder: str | pathlib.Path) -> dict[str, Store] | None:
+    """
+    Return the readers of the levels of the pyramid of a model folder, ``None`` if it is not built.
+    """
+    folder = pathlib.Path(folder)
+    for backend in BACKENDS:
+        if all(pyramid_path(folder, lvl, backend).exists() for lvl in pyramid.LEVELS):
+            return {level: _open(folder, backend, level) for level in pyramid.LEVELS}
+    return None
+
+
+def envelopes(
+    folder: str | pathlib.Path, station: str
+) -> dict[str, pd.DataFrame] | None:
+    """
+    Return the ``min``, ``max`` and ``count`` of a station at each level of the pyramid of a model
+    folder.
+
+    ``None`` if the pyramid is not built or does not have the station.
+    """
+    levels = open_pyramid(folder)
+    columns = [f"{station}/{column}" for column in pyramid.COLUMNS]
+    if levels is None or not all(c in levels[pyramid.LEVELS[0]] for c in columns):
+        return None
+    return {
+        level: reader.frame(stations=columns)
+        .set_axis(list(pyramid.COLUMNS), axis=1)
+        .dropna()
+        for level, reader in levels.items()
+    }
+
+
+def _station(path: pathlib.Path, column: str | None = None) -> Station:
+    table = arrow.read_table(path)
+    (time,) = table.schema.pandas_metadata["index_columns"]
+    name = column or table.column_names[0]
+    return Station(table.column(time).to_numpy(), table.column(name).to_numpy(), name)
+
+
+def _times(stations: T.Sequence[Station]) -> np.ndarray:
+    # The union of the time steps, a few stations at a time
+    times = np.array([], dtype="datetime64[ns]")
+    for start in range(0, len(stations), STATION_CHUNK):
+        block = [station.times for station in stations[start : start + STATION_CHUNK]]
+        times = np.unique(np.concatenate([times, *block]))
+    return times
+
+
+def _column(station: Station, times: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    # The values of a station on the times of the store, NaN elsewhere
+    column = np.full(len(times), np.nan, dtype=dtype)
+    lo = np.searchsorted(station.times, times[0], side="left")
+    hi = np.searchsorted(station.times, times[-1], side="right")
+    index = station.times[lo:hi]
+    # The first value of the duplicated times
+    first = np.ones(len(index), dtype=bool)
+    first[1:] = index[1:] != index[:-1]
+    column[np.searchsorted(times, index[first])] = station.values[lo:hi][first]
+    return column
+
+
+def _write_arrow(
+    stations: dict[str, Station],
+    times: np.ndarray,
+    dtype: np.dtype,
+    name: str,
+    target: pathlib.Path,
+) -> None:
+    schema = pa.schema(
+        [pa.field("time", pa.timestamp("ns"))]
+        + [pa.field(station, pa.from_numpy_dtype(dtype)) for station in stations],
+        metadata={"name": name},
+    )
+    tmp = target.with_suffix(f".{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for start in range(0, len(times), TIME_CHUNK):
+                chunk = times[start : start + TIME_CHUNK]
+                arrays = [pa.array(chunk)] + [
+                    pa.array(_column(station, chunk, dtype))
+                    for station in stations.values()
+                ]
+                writer.write_batch(pa.record_batch(arrays, schema=schema))
+    tmp.replace(target)
+
+
+def _write_zarr(
+    stations: dict[str, Station],
+    times: np.ndarray,
+    dtype: np.dtype,
+    name: str,
+    target: pathlib.Path,
+) -> None:
+    import zarr
+
+    tmp = target.with_suffix(f".{os.getpid()}.tmp")
+    group = zarr.open_group(str(tmp), mode="w")
+    group.attrs["name"] = name
+    group.array("time", times)
+    group.array("station", np.array(list(stations), dtype=str))
+    values = group.full(
+        "values",
+        shape=(len(times), len(stations)),
+        chunks=(TIME_CHUNK, STATION_CHUNK),
+        dtype=dtype,
+        fill_value=np.nan,
+    )
+    # One column of chunks at a time: the memory does not grow with the number of stations
+    columns = list(stations.values())
+    for start in range(0, len(columns), STATION_CHUNK):
+        block = columns[start : start + STATION_CHUNK]
+        values[:, start : start + len(block)] = np.column_stack(
+            [_column(station, times, dtype) for station in block]
+        )
+    zarr.consolidate_metadata(str(tmp))
+    _swap(tmp, target)
+
+
+def _swap(tmp: pathlib.Path, target: pathlib.Path) -> None:
+    # Several workers may build the same store: each group has its own name and the link is
+    # replaced in one step, the readers always find a complete store
+    previous = target.resolve() if target.is_symlink() else None
+    version = VERSIONS_FOLDER / target.relative_to(STORE_FOLDER)
+    version = version.with_name(f"{target.name}.{time.time_ns()}")
+    version.parent.mkdir(parents=True, exist_ok=True)
+    tmp.rename(version)
+    link = target.with_suffix(f".{os.getpid()}.link.tmp")
+    link.unlink(missing_ok=True)
+    link.symlink_to(os.path.relpath(version, target.parent))
+    if target.is_dir() and not target.is_symlink():
+        # A group written before the links
+        shutil.rmtree(target)
+    os.replace(link, target)
+    # The readers opened before this build still read the previous group, the groups written at the
+    # same time by the other workers may be linked after this one
+    if previous is not None:
+        for old in _versions(target):
+            if _stamp(old) < _stamp(previous):
+                shutil.rmtree(old, ignore_errors=True)
+
+
+def build(folder: pathlib.Path, backend: str = "arrow") -> pathlib.Path:
+    """
+    Gather the series of all the stations of a model folder in a store, and their pyramid.
+
+    The series stay memory-mapped, each one is read piece by piece as the store is written: the
+    memory does not grow with the number of stations.
+    """
+    parquets = sorted(folder.glob("*.parquet"))
+    target = store_path(folder, backend)
+    if _is_stale(parquets, target):
+        logger.info("Building %s", target)
+        stations = {
+            parquet.stem: _station(arrow.build_timeseries(parquet))
+            for parquet in parquets
+        }
+        _write(stations, backend, target)
+    _build_pyramid(folder, parquets, backend)
+    # The readers pick the first backend found, only the latest stores are kept
+    for other in BACKENDS:
+        if other != backend:
+            _remove(store_path(folder, other))
+            for level in pyramid.LEVELS:
+                _remove(pyramid_path(folder, level, other))
+    return target
+
+
+def _is_stale(parquets: list[pathlib.Path], target: pathlib.Path) -> bool:
+    return not parquets or any(arrow.is_stale(parquet, target) for parquet in parquets)
+
+
+def _write(stations: dict[str, Station], backend: str, target: pathlib.Path) -> None:
+    times = _times(list(stations.values()))
+    # At least float32: NaN marks the missing values, integer series included
+    dtype = np.result_type(np.float32, *(s.values.dtype for s in stations.values()))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    writer = _write_zarr if backend == "zarr" else _write_arrow
+    writer(stations, times, dtype, next(iter(stations.values())).name, target)
+
+
+def _build_pyramid(
+    folder: pathlib.Path, parquets: list[pathlib.Path], backend: str
+) -> None:
+    paths = {level: pyramid_path(folder, level, backend) for level in pyramid.LEVELS}
+    if all(_is_current(parquets, path, backend) for path in paths.values()):
+        return
+    # The levels of each station first, one station at a time, then gathered level by level
+    for parquet in parquets:
+        station = _station(arrow.build_timeseries(parquet))
+        pyramid.build(parquet, pd.Series(station.values, index=station.times))
+    for level, path in paths.items():
+        logger.info("Building %s", path)
+        stations = {
+            f"{parquet.stem}/{column}": _station(
+                pyramid.level_path(parquet, level), column
+            )
+            for parquet in parquets
+            for column in pyramid.COLUMNS
+        }
+        _write(stations, backend, path)
+
+
+def _is_current(parquets: list[pathlib.Path], path: pathlib.Path, backend: str) -> bool:
+    # The levels built before the counts are rebuilt
+    if _is_stale(parquets, path):
+        return False
+    return f"{parquets[0].stem}/count" in READERS[backend](path)
+
+
+def _remove(path: pathlib.Path) -> None:
+    if path.is_symlink():
+        path.unlink()
+        for version in _versions(path):
+            shutil.rmtree(version, ignore_errors=True)
+    elif path.is_file():
+        path.unlink()
+    elif path.is_dir():
+        shutil.rmtree(path)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Gather the time series of each model in a single store"
+    )
+    parser.add_argument("--backend", choices=BACKENDS, default="arrow")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = get_parser().parse_args(argv)
+    folders = [OBSERVED] + sorted(p for p in MODELS_FOLDER.glob("*") if p.is_dir())
+    for folder in folders:
+        if not any(folder.glob("*.parquet")):
+            continue
+        logger.info("%s done", build(folder, args.backend))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,131 @@
+"""
+Fill the caches and render every app once before the server accepts sessions.
+
+Use it with ``panel serve --setup seareport_skill/warmup.py`` or through ``python -mseareport_skill.server --preload``.
+With several worker processes, the caches are filled before the fork and each worker renders the
+apps after it: no event loop may run in the parent of the fork.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import glob
+import logging
+import time
+import typing as T
+
+from seareport_skill import arrow
+from seareport_skill import load_countries
+from seareport_skill import profiling
+from seareport_skill import query
+from seareport_skill import service
+from seareport_skill import settings
+
+logger = logging.getLogger(__name__)
+
+LABEL = "warmup"
+# The callbacks scheduled by the callbacks, e.g. a pane updated from an offloaded callback
+MAX_TICKS = 10
+
+
+def _step(name: str, func: T.Callable[..., T.Any], *args: T.Any) -> float:
+    start = time.perf_counter()
+    try:
+        func(*args)
+    except Exception:
+        profiling.observe(f"{name} (failed)", time.perf_counter() - start, LABEL)
+        logger.exception("warm-up: %s failed", name)
+        raise
+    duration = time.perf_counter() - start
+    profiling.observe(name, duration, LABEL)
+    logger.info("warm-up: %s took %.3fs", name, duration)
+    return duration
+
+
+async def _render(path: str) -> None:
+    from bokeh.server.callbacks import NextTickCallback
+    from panel.io.application import build_single_handler_application
+    from panel.io.session import generate_session
+
+    # Same as `panel serve --warm`: run the app script and build the bokeh models of its default view
+    application = build_single_handler_application(path)
+    session = generate_session(application)
+    doc = session.document
+    try:
+        for handler in application.handlers:
+            if handler.failed:
+                raise RuntimeError(f"{path}: {handler.error}")
+        # The offloaded callbacks are next tick callbacks of the document, run by the server loop
+        # of a live session: await them so that the views they compute are built too
+        for _ in range(MAX_TICKS):
+            callbacks = [
+                callback
+                for callback in doc.session_callbacks
+                if isinstance(callback, NextTickCallback)
+            ]
+            if not callbacks:
+                break
+            for callback in callbacks:
+                doc.remove_next_tick_callback(callback)
+                result = callback.callback()
+                if asyncio.iscoroutine(result):
+                    await result
+    finally:
+        # The application of panel destroys the document with the state of its session, the
+        # roots of its views stay registered: one set per app and per process
+        session.destroy()
+
+
+def render_app(path: str) -> None:
+    asyncio.run(_render(path))
+
+
+def warm_caches() -> dict[str, float]:
+    """
+    Fill the caches of the stats, the spatial index and the search of every version.
+    """
+    durations = {}
+    durations["assets"] = _step("assets", arrow.build)
+    durations["countries"] = _step("countries", load_countries)
+    durations["regions"] = _step("regions", service.regions)
+    durations["stats"] = _step("stats", service.stats)
+    durations["query"] = _step("query", query.load_table)
+    for version in settings.VERSIONS.values():
+        durations[f"stats {version}"] = _step(
+            f"stats {version}", service.stats, version
+        )
+        durations[f"stations {version}"] = _step(
+            f"stations {version}", service.station_index, version
+        )
+        durations[f"search {version}"] = _step(
+            f"search {version}", service.search_stations, "", 0, version
+        )
+    return durations
+
+
+def render_apps(files: list[str] | None = None) -> dict[str, float]:
+    """
+    Render each app once, the apps that fail are logged and skipped.
+    """
+    durations = {}
+    for path in sorted(glob.glob("*app.py")) if files is None else files:
+        try:
+            durations[f"render {path}"] = _step(f"render {path}", render_app, path)
+        except Exception:
+            continue
+    return durations
+
+
+def warmup(files: list[str] | None = None) -> dict[str, float]:
+    durations = {**warm_caches(), **render_apps(files)}
+    logger.info("warm-up: done in %.3fs", sum(durations.values()))
+    return durations
+
+
+def on_server_loaded(server_context: T.Any) -> None:
+    warmup()
+
+
+if __name__ in ("__main__", "panel_setup_module"):
+    logging.basicConfig(level=logging.INFO)
+    warmup()
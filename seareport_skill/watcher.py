@@ -0,0 +1,312 @@
+"""
+Hot reload of the data: the caches follow the files of ``assets`` and ``01_obs`` without a restart.
+
+A thread of each worker watches the folders (inotify, or polling where it is not available) and maps
+the changed files to the caches computed from them:
+
+- the stats of the versions (``assets/v*.parquet``), the regions or ``model_stats.arrow``: the stats
+  are rebuilt, their caches and the DuckDB connections are reset, and ``settings.VERSIONS`` follows
+  the versions of the new stats;
+- the stats of the periods: the DuckDB connections are reset;
+- the series of a station (``01_obs/**/<station>.parquet``): only the entries of that station are
+  evicted, the consolidated store of its folder is rebuilt when there is one;
+- a consolidated store or its pyramid: only the readers of that store and the envelopes read from it
+  are evicted;
+- the other Arrow files (extremes, cumulative sums): only the entries of those files are evicted.
+
+Only one worker at a time rebuilds the files (``REBUILD_LOCK``), the others evict their caches when
+the rebuilt files change in turn. The caches are then filled again in the background, before the
+sessions ask for them. The widgets passed to ``follow_versions`` pick up the new versions in the
+running sessions. The plots cache and the ETags of ``/stats`` are keyed by the content of the files,
+they need nothing.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import logging
+import os
+import pathlib
+import threading
+import typing as T
+
+import panel as pn
+
+import seareport_skill
+from seareport_skill import arrow
+from seareport_skill import extremes
+from seareport_skill import geo
+from seareport_skill import periods
+from seareport_skill import plotcache
+from seareport_skill import query
+from seareport_skill import service
+from seareport_skill import settings
+from seareport_skill import store
+from seareport_skill import warmup
+from seareport_skill import windows
+
+logger = logging.getLogger(__name__)
+
+__all__: list[str] = [
+    "enable",
+    "follow_versions",
+    "invalidate",
+    "start",
+    "stop",
+]
+
+WATCHED = (arrow.ASSETS_FOLDER, extremes.OBS_FOLDER)
+# Held by the worker rebuilding the files, the other workers only evict their caches
+REBUILD_LOCK = arrow.ARROW_FOLDER / "rebuild.lock"
+# Written by the apps while they read the watched files
+IGNORED = (
+    plotcache.PLOTS_FOLDER,
+    arrow.ARROW_FOLDER / "timeseries",
+    arrow.ARROW_FOLDER / "pyramid",
+    # The link of a Zarr store changes once its group is complete
+    store.VERSIONS_FOLDER,
+    REBUILD_LOCK,
+)
+STORE_FOLDER = store.STORE_FOLDER
+# How often the sessions compare their widgets with settings.VERSIONS, in ms
+SYNC_PERIOD = 5000
+
+_lock = threading.Lock()
+_enabled = False
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+_pid: int | None = None
+# The content of the stats when they were last reset
+_stats_key: str | None = None
+
+
+class Changes(T.NamedTuple):
+    stats: bool
+    regions: bool
+    periods: bool
+    stores: set[str]
+    series: set[pathlib.Path]
+    files: set[pathlib.Path]
+
+
+def _resolve(path: str | pathlib.Path) -> pathlib.Path:
+    # Not the last part: a store is a link to its Zarr group
+    path = pathlib.Path(path).absolute()
+    return path.parent.resolve() / path.name
+
+
+def _is_in(path: pathlib.Path, folder: pathlib.Path) -> bool:
+    return path.is_relative_to(_resolve(folder))
+
+
+def _accept(change: T.Any, path: str) -> bool:
+    resolved = _resolve(path)
+    # The temporary files are renamed once complete, only the final file is a change
+    if ".tmp" in resolved.suffixes:
+        return False
+    return not any(_is_in(resolved, folder) for folder in IGNORED)
+
+
+def classify(paths: T.Iterable[str | pathlib.Path]) -> Changes:
+    """
+    Sort the changed files by the caches they feed.
+    """
+    stats = regions = period = False
+    stores: set[str] = set()
+    series: set[pathlib.Path] = set()
+    files: set[pathlib.Path] = set()
+    for path in map(_resolve, paths):
+        if path == _resolve(geo.REGIONS):
+            regions = True
+        elif path == _resolve(arrow.arrow_path("model_stats")) or (
+            path.parent == _resolve(arrow.ASSETS_FOLDER) and path.match("v*.parquet")
+        ):
+            stats = True
+        elif _is_in(path, periods.PERIODS_FOLDER):
+            period = True
+        elif _is_in(path, STORE_FOLDER):
+            # `<folder>.arrow` or a file of the `<folder>.zarr` group
+            name = path.relative_to(_resolve(STORE_FOLDER)).parts[0]
+            stores.add(name.rsplit(".", 1)[0])
+        elif _is_in(path, extremes.OBS_FOLDER) and path.suffix == ".parquet":
+            series.add(path)
+        else:
+            files.add(path)
+    # The regions of the stations are assigned when the stats are loaded
+    return Changes(stats or regions, regions, period, stores, series, files)
+
+
+@contextlib.contextmanager
+def _rebuilding() -> T.Iterator[bool]:
+    """
+    Yield whether this worker rebuilds the files, only one worker at a time does.
+
+    The others find the files rebuilt by that worker in their next changes.
+    """
+    REBUILD_LOCK.parent.mkdir(parents=True, exist_ok=True)
+    with REBUILD_LOCK.open("a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _reset_stats() -> bool:
+    if not any(arrow.ASSETS_FOLDER.glob("v*.parquet")):
+        # Being replaced: keep the stats until the new files are there
+        return False
+    global _stats_key
+    with _rebuilding() as rebuild:
+        if rebuild:
+            arrow.build()
+    key = arrow.fingerprint([arrow.arrow_path("model_stats"), geo.REGIONS])
+    if key == _stats_key:
+        # Our own rebuild of model_stats.arrow, or another worker's
+        return False
+    _stats_key = key
+    for func in (
+        seareport_skill.load_stats,
+        seareport_skill._version_slices,
+        service.station_index,
+        service._station_search,
+    ):
+        func.cache_clear()
+    query.reset()
+    _sync_versions()
+    return True
+
+
+def _sync_versions() -> None:
+    versions = list(seareport_skill.load_stats()["version"].cat.categories)
+    synced = {
+        label: version
+        for label, version in settings.VERSIONS.items()
+        if version in versions
+    }
+    # The new versions have no label yet
+    synced.update({v: v for v in versions if v not in synced.values()})
+    if synced != settings.VERSIONS:
+        logger.info("Versions: %s", ", ".join(synced.values()))
+        # A new dict: the widgets still hold the previous one and see the change
+        settings.VERSIONS = synced
+
+
+def _same(path: pathlib.Path) -> T.Callable[..., bool]:
+    def match(key: T.Any, *args: T.Any, **kwargs: T.Any) -> bool:
+        return _resolve(key) == path
+
+    return match
+
+
+def _rebuild_stores(series: set[pathlib.Path]) -> None:
+    with _rebuilding() as rebuild:
+        if not rebuild:
+            # The changes of the rebuilt stores evict their readers
+            return
+        for folder in {path.parent for path in series}:
+            for backend in store.BACKENDS:
+                if store.store_path(folder, backend).exists():
+                    store.build(folder, backend)
+                    store._open.cache_evict(
+                        lambda f, *args, name=folder.name: f.name == name
+                    )
+
+
+def invalidate(paths: T.Iterable[str | pathlib.Path]) -> Changes:
+    """
+    Evict the cache entries computed from the files ``paths``, rebuild what depends on them.
+
+    ``stats`` is true in the returned changes when the stats were reloaded.
+    """
+    paths = {_resolve(path) for path in paths}
+    for path in paths:
+        arrow.forget_hash(path)
+    changes = classify(paths)
+    if changes.regions:
+        seareport_skill.load_regions.cache_clear()
+    if changes.stats:
+        changes = changes._replace(stats=_reset_stats())
+    if changes.periods and not changes.stats:
+        query.reset()
+    for name in changes.stores:
+        store._open.cache_evict(lambda folder, *args, name=name: folder.name == name)
+        # The envelopes read from the pyramid of the store
+        service._load_pyramid.cache_evict(
+            lambda path, name=name: path.parent.name == name
+        )
+    for path in changes.series:
+        service._load_timeseries.cache_evict(_same(path))
+        service._load_pyramid.cache_evict(_same(path))
+    _rebuild_stores(changes.series)
+    for path in changes.files:
+        extremes._read.cache_evict(_same(path))
+        windows._load.cache_evict(_same(path))
+    return changes
+
+
+def _watch() -> None:
+    import watchfiles
+
+    folders = [folder for folder in WATCHED if folder.exists()]
+    logger.info("Watching %s", ", ".join(map(str, folders)))
+    for batch in watchfiles.watch(*folders, watch_filter=_accept, stop_event=_stop):
+        paths = {path for _, path in batch}
+        try:
+            changes = invalidate(paths)
+            if changes.stats:
+                warmup.warm_caches()
+        except Exception:
+            # A file being written: the next change tries again
+            logger.exception("Failed to reload %d files", len(paths))
+
+
+def start() -> None:
+    """
+    Start the watcher thread of the current process, once.
+    """
+    global _thread, _pid, _stats_key
+    with _lock:
+        # The threads do not survive a fork, each worker starts its own
+        if _thread is not None and _thread.is_alive() and _pid == os.getpid():
+            return
+        _stats_key = arrow.fingerprint([arrow.arrow_path("model_stats"), geo.REGIONS])
+        _stop.clear()
+        _pid = os.getpid()
+        _thread = threading.Thread(target=_watch, name="seareport-watcher", daemon=True)
+        _thread.start()
+
+
+def stop() -> None:
+    _stop.set()
+    if _thread is not None:
+        _thread.join()
+
+
+def enable() -> None:
+    """
+    Watch the files from the first session of each worker, call it before the server starts.
+    """
+    global _enabled
+    _enabled = True
+    pn.state.on_session_created(lambda session_context: start())
+
+
+def follow_versions(*widgets: pn.widgets.Widget) -> None:
+    """
+    Keep the options of the version widgets of the current session in sync with ``settings.VERSIONS``.
+    """
+    if not _enabled or not (pn.state.curdoc and pn.state.curdoc.session_context):
+        return
+
+    def sync() -> None:
+        for widget in widgets:
+            if widget.options is not settings.VERSIONS:
+                widget.options = settings.VERSIONS
+
+    pn.state.add_periodic_callback(sync, period=SYNC_PERIOD)
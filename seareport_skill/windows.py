@@ -0,0 +1,201 @@
+"""
+Skill metrics over any time window, from cumulative sums.
+
+For each model and station, the model and observed series are aligned once and the running sums of
+``n``, ``obs``, ``sim``, ``obs²``, ``sim²``, ``obs·sim`` and ``|obs - sim|`` are stored. The sums over
+``[start, end]`` are the difference of two rows, so the metrics of a window cost two bisections
+per station, whatever the length of the window.
+
+All the stations of a model are in a single Arrow file in ``assets/arrow/windows``. Each station
+starts with a row of zeros, and the rows are sorted by ``station_code << 32 | minute``, so the
+windows of all the stations are found with one vectorized ``searchsorted``.
+``python -mseareport_skill.windows`` builds the files of every model.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import pathlib
+import typing as T
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from seareport_skill import arrow
+from seareport_skill import skill
+from seareport_skill.extremes import MODELS_FOLDER
+from seareport_skill.extremes import OBSERVED
+from seareport_skill.profiling import cached
+
+logger = logging.getLogger(__name__)
+
+__all__: list[str] = [
+    "build",
+    "cumulative_sums",
+    "METRICS",
+    "window_stats",
+]
+
+SUMS = ["n", "obs", "sim", "obs2", "sim2", "obs_sim", "abs_error"]
+METRICS = [
+    "bias",
+    "rmse",
+    "rms",
+    "sim_mean",
+    "obs_mean",
+    "sim_std",
+    "obs_std",
+    "nse",
+    "lamba",
+    "cr",
+    "mad",
+    "kge",
+]
+# The times are stored as minutes since ORIGIN, on 32 bits: until the year 10066
+ORIGIN = pd.Timestamp("1900-01-01")
+LAST_MINUTE = 2**32 - 1
+
+
+def windows_path(model: pathlib.Path) -> pathlib.Path:
+    return arrow.ARROW_FOLDER / "windows" / f"{model.name}.arrow"
+
+
+def _minutes(times: T.Any, ceil: bool = False) -> np.ndarray:
+    # Minute 0 is the row of zeros of each station
+    delta = (pd.DatetimeIndex(np.atleast_1d(times)) - ORIGIN) / pd.Timedelta("1min")
+    minutes = np.ceil(delta) if ceil else np.floor(delta)
+    return np.clip(minutes.to_numpy() + 1, 1, LAST_MINUTE).astype(np.int64)
+
+
+def cumulative_sums(sim: pd.Series, obs: pd.Series) -> pd.DataFrame:
+    """
+    Return the running sums of the series aligned as ``seastats.align_ts``, after a row of zeros.
+    """
+    index, sim_values, obs_values = skill.align({"sim": sim}, obs)
+    valid = ~np.isnan(sim_values[:, 0])
+    sim_ = sim_values[valid, 0]
+    obs_ = obs_values[valid, 0]
+    terms = np.column_stack(
+        [
+            np.ones_like(obs_),
+            obs_,
+            sim_,
+            obs_**2,
+            sim_**2,
+            obs_ * sim_,
+            np.abs(obs_ - sim_),
+        ]
+    )
+    sums = np.vstack([np.zeros((1, len(SUMS))), np.cumsum(terms, axis=0)])
+    minutes = np.concatenate([[0], _minutes(index[valid])])
+    return pd.DataFrame(sums, columns=SUMS).assign(minute=minutes)
+
+
+def build_model(model: pathlib.Path) -> pathlib.Path:
+    from seareport_skill import service
+
+    target = windows_path(model)
+    pairs = [
+        (parquet.stem, model / parquet.name)
+        for parquet in sorted(OBSERVED.glob("*.parquet"))
+        if (model / parquet.name).exists()
+    ]
+    sources = [path for _, path in pairs] + [OBSERVED / path.name for _, path in pairs]
+    if not any(arrow.is_stale(source, target) for source in sources):
+        return target
+    logger.info("Building %s", target)
+    frames = []
+    for station, _ in pairs:
+        sim = service.timeseries(station, model)
+        obs = service.timeseries(station, OBSERVED)
+        frames.append(cumulative_sums(sim, obs).assign(station=station))
+    df = pd.concat(frames, ignore_index=True)
+    # The stations are sorted, their codes increase with the rows
+    df["station"] = df["station"].astype("category")
+    arrow.write_frame(df, target)
+    return target
+
+
+def build(max_workers: int | None = None) -> None:
+    models = sorted(path for path in MODELS_FOLDER.glob("*") if path.is_dir())
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        for target in executor.map(build_model, models):
+            logger.info("%s done", target)
+
+
+@cached
+def _load(path: pathlib.Path) -> tuple[pd.Index, np.ndarray, dict[str, np.ndarray]]:
+    df = arrow.read_frame(path)
+    codes = df["station"].cat.codes.to_numpy().astype(np.int64)
+    keys = (codes << 32) | df["minute"].to_numpy()
+    sums = {column: df[column].to_numpy() for column in SUMS}
+    return df["station"].cat.categories, keys, sums
+
+
+def _metrics(sums: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    n = sums["n"]
+    obs_mean = sums["obs"] / n
+    sim_mean = sums["sim"] / n
+    # Sums of the squared anomalies and of the cross products, around the means of the window
+    obs_ss = sums["obs2"] - sums["obs"] * obs_mean
+    sim_ss = sums["sim2"] - sums["sim"] * sim_mean
+    cross = sums["obs_sim"] - sums["obs"] * sim_mean
+    squared_error = sums["obs2"] - 2 * sums["obs_sim"] + sums["sim2"]
+    obs_std = np.sqrt(obs_ss / (n - 1))
+    sim_std = np.sqrt(sim_ss / (n - 1))
+    cr = cross / np.sqrt(obs_ss * sim_ss)
+    kappa = np.where(cr >= 0, 0.0, 2 * np.abs(cross))
+    return {
+        "bias": sim_mean - obs_mean,
+        "rmse": np.sqrt(squared_error / n),
+        "rms": np.sqrt(np.maximum(obs_ss + sim_ss - 2 * cross, 0) / n),
+        "sim_mean": sim_mean,
+        "obs_mean": obs_mean,
+        "sim_std": sim_std,
+        "obs_std": obs_std,
+        "nse": 1 - squared_error / obs_ss,
+        "lamba": 1
+        - squared_error / (obs_ss + sim_ss + n * (obs_mean - sim_mean) ** 2 + kappa),
+        "cr": cr,
+        "mad": np.sqrt(
+            np.maximum(squared_error - sums["abs_error"] ** 2 / n, 0) / (n - 1)
+        ),
+        "kge": 1
+        - np.sqrt(
+            (cr - 1) ** 2
+            + ((sim_mean - obs_mean) / obs_std) ** 2
+            + (sim_std / obs_std - 1) ** 2
+        ),
+    }
+
+
+def window_stats(
+    model: str | pathlib.Path, start: T.Any = None, end: T.Any = None
+) -> pd.DataFrame:
+    """
+    Return the metrics of all the stations of a model between ``start`` and ``end`` (included).
+
+    Same values as ``skill.get_stats`` on the aligned series restricted to the window, up to
+    floating point rounding. The ``n`` column counts the aligned time steps in the window, the
+    stations without any get NaN.
+    """
+    stations, keys, sums = _load(windows_path(pathlib.Path(model)))
+    codes = np.arange(len(stations), dtype=np.int64) << 32
+    first = 1 if start is None else _minutes(start, ceil=True)
+    last = LAST_MINUTE if end is None else _minutes(end)
+    # The last row before the window (at least the row of zeros) and the last row in the window
+    before = np.searchsorted(keys, codes | first, side="left") - 1
+    until = np.searchsorted(keys, codes | last, side="right") - 1
+    until = np.maximum(until, before)
+    window = {column: values[until] - values[before] for column, values in sums.items()}
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        metrics = _metrics(window)
+    return pd.DataFrame({"n": window["n"].astype(np.int64), **metrics}, index=stations)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build()
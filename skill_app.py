@@ -1,17 +1,18 @@
 import glob
-import json
-from typing import Any
-from typing import Dict
-from typing import Optional
+import threading
 
-import geopandas as gp
 import holoviews as hv
 import hvplot.pandas  # noqa: F401
 import pandas as pd
 import panel as pn
 import param
-import shapely
 
+from seareport_skill import concurrency
+from seareport_skill import load_countries
+from seareport_skill import profiling
+from seareport_skill import service
+from seareport_skill import settings
+from seareport_skill import watcher
 from utils.hists import hist_
 from utils.hists import radar_plot
 from utils.hists import scatter_hist
@@ -21,18 +22,8 @@ hv.extension("bokeh")
 
 # Constants and configuration
 SURGE_FOLDER = "./obs/surge/"
-STATS_JSON = "assets/stats_all.json"
 TMIN = "2023-01-01"
 TMAX = "2023-12-31"
-VERSIONS = {
-    "Global 50km": "v0",
-    "Global 20km": "v0.2",
-    "Global 7km": "v1.2",
-    "Global 3km, L5 GSSHS": "v2.1",
-    "Global 3km, L6 GSSHS": "v2.2",
-    # Add other versions here
-}
-
 PLOT_OPTS = {
     "ts_view": dict(width=1000, height=600),
     "taylor_view": dict(width=700, height=700),
@@ -44,29 +35,8 @@ PLOT_OPTS = {
     "obs_opts": dict(color="red"),
 }
 
-PARAMS = {
-    "Root Mean Square Error": "rmse",
-    "Root Mean Square [m]": "rms",
-    "Root Mean Square >95th percentile": "rms_95",
-    "Bias [m]": "bias",
-    "Kling-Guplta efficiency": "kge",
-    "Nash-Sutcliffe model efficiency": "nse2",
-    "Lamba index": "lamba",
-    "Slope": "slope",
-    "Slope of percentiles": "slopepp",
-    "Correation Coefficient": "cr",
-    "Correlation Coefficient >95th percentile": "cr_95",
-    "Mean Absolute deviation": "mad",
-    "Mean Absolute deviation of percentiles": "madp",
-    "Normalized error on highest peak": "R1_norm",
-    "Normalized error on 3 highest peaks": "R3_norm",
-    "Normalized error on peaks >95th percentile": "error99",
-    "Normalized error on peaks >99th percentile": "error95",
-    "Error on highest peak [m]": "R1",
-    "Error on 3 highest peaks [m]": "R3",
-    "Error on peaks >95th percentile [m]": "error95m",
-    "Error on peaks >99th percentile [m]": "error99m",
-}
+# The dashboard shows the NSE clipped at 0
+PARAMS = {**settings.METRICS, "Nash-Sutcliffe model efficiency": "nse2"}
 
 PARAMS_SPIDER = {
     "Slope": "slope",
@@ -113,49 +83,33 @@ def load_data() -> pd.DataFrame:
     return stations_df
 
 
-def load_stats() -> Dict[str, Any]:
-    with open(STATS_JSON) as f:
-        stats = json.load(f)
-    return stats
-
-
-def find_ocean_for_station(
-    station, oceans_df, xstr="longitude", ystr="latitude"
-) -> Optional[str]:
-    point = shapely.geometry.Point(station[xstr], station[ystr])
-    for _, ocean in oceans_df.iterrows():
-        if point.within(ocean["geometry"]):
-            return ocean["name"]
-    return None
-
-
 class Dashboard(param.Parameterized):
-    version = param.Selector(objects=VERSIONS)
+    # Not checked: the widget follows settings.VERSIONS when the versions change
+    version = param.Selector(objects=settings.VERSIONS, check_on_set=False)
     parameter = param.Selector(objects=PARAMS)
     plot_type = param.Selector(objects=PLOT_TYPE)
     selected_station = param.Integer(default=0)
 
     def __init__(self, **params):
         super().__init__(**params)
-        self.oceans_ = gp.read_file("assets/world_oceans_final.json")
+        self.oceans_ = service.regions()
         self.df = pd.DataFrame()
         self.ocean_mapping = {}
-        self.countries = gp.read_file(
-            "assets/ne_110m_admin_0_countries/ne_110m_admin_0_countries.shp"
-        )
-        self.stats = load_stats()
+        self.countries = load_countries()
+        # The views run concurrently on the executor and share the state set by update_data
+        self._lock = threading.Lock()
+        self._version = None
         self.update_data()
 
-    @param.depends("version", watch=True)
+    @profiling.instrument
     def update_data(self):
-        self.df = pd.DataFrame(self.stats[self.version]).T
-        self.df = self.df.astype(float)
-        self.df["ocean"] = self.df.apply(
-            lambda station: find_ocean_for_station(
-                station, self.oceans_, "obs_lon", "obs_lat"
-            ),
-            axis=1,
-        )
+        # The views depending on the version share a single update
+        if self._version == self.version:
+            return
+        with profiling.stage("load"):
+            self.df = service.stats(self.version).copy()
+            # The dashboard groups the stations by maritime sector
+            self.df["ocean"] = self.df["name"]
         # Create a color mapping for oceans
         unique_oceans = self.df["ocean"].unique()
         color_key = hv.Cycle("Category20").values
@@ -164,21 +118,23 @@ class Dashboard(param.Parameterized):
             for i, ocean in enumerate(unique_oceans)
         }
         # Apply the color mapping to the oceans map
-        self.map_ = self.oceans_[self.oceans_["name"].isin(unique_oceans)].hvplot(
-            color="name",
-            alpha=0.9,
-            **PLOT_OPTS["ts_view"],
-            cmap=self.ocean_mapping,  # Use the color mapping dictionary
-            tools=[],
-            xlim=(-180, 180),
-            ylim=(-90, 90),
-            legend=False,
-        ) * self.countries.hvplot().opts(color="grey", line_alpha=0.9, tools=[])
+        with profiling.stage("plot"):
+            self.map_ = self.oceans_[self.oceans_["name"].isin(unique_oceans)].hvplot(
+                color="name",
+                alpha=0.9,
+                **PLOT_OPTS["ts_view"],
+                cmap=self.ocean_mapping,  # Use the color mapping dictionary
+                tools=[],
+                xlim=(-180, 180),
+                ylim=(-90, 90),
+                legend=False,
+            ) * self.countries.hvplot().opts(color="grey", line_alpha=0.9, tools=[])
 
         self.df = self.df.dropna()
         self.df["ioc_code"] = self.df.index
         self.df.loc[self.df["nse"] > 0, "nse2"] = self.df["nse"]
         self.df.loc[self.df["nse"] < 0, "nse2"] = 0
+        self._version = self.version
 
     def get_parameter_name(self, dict_):
         key_list = list(dict_.keys())
@@ -187,69 +143,89 @@ class Dashboard(param.Parameterized):
         return param_name
 
     @param.depends("version", "parameter")
+    @concurrency.offload
+    @profiling.instrument
     def view(self):
-        # Update the DataFrame based on the selected version
-        self.update_data()
-        scatter_ = scatter_hist(self.df, "obs_lon", "obs_lat", self.parameter)
+        with self._lock:
+            # Update the DataFrame based on the selected version
+            self.update_data()
+            with profiling.stage("plot"):
+                scatter_ = scatter_hist(self.df, "obs_lon", "obs_lat", self.parameter)
 
-        # Update the layout with new plots
-        layout = pn.Column(self.map_ * scatter_)
-        return layout
+            # Update the layout with new plots
+            layout = pn.Column(profiling.HoloViews(self.map_ * scatter_))
+            return layout
 
     @param.depends("version")
+    @concurrency.offload
+    @profiling.instrument
     def taylor(self):
-        self.update_data()
-        diagram = taylor_diagram(pd.DataFrame())
-        for ocean in self.ocean_mapping.keys():
-            df = self.df[self.df["ocean"] == ocean]
-            diagram *= taylor_diagram(
-                df, norm=True, color=self.ocean_mapping[ocean], label=ocean
-            )
-        return diagram.opts(
-            **PLOT_OPTS["taylor_view"],
-            shared_axes=False,
-            legend_opts={"background_fill_alpha": 0.6},
-        )
+        with self._lock:
+            self.update_data()
+            with profiling.stage("plot"):
+                diagram = taylor_diagram(pd.DataFrame())
+                for ocean in self.ocean_mapping.keys():
+                    df = self.df[self.df["ocean"] == ocean]
+                    diagram *= taylor_diagram(
+                        df, norm=True, color=self.ocean_mapping[ocean], label=ocean
+                    )
+                diagram = diagram.opts(
+                    **PLOT_OPTS["taylor_view"],
+                    shared_axes=False,
+                    legend_opts={"background_fill_alpha": 0.6},
+                )
+            return profiling.HoloViews(diagram)
 
     @param.depends("version")
+    @concurrency.offload
+    @profiling.instrument
     def radar(self):
-        self.update_data()
-        return radar_plot(
-            self.df,
-            PARAMS_SPIDER,
-            OCEANS_SPIDER,
-            g="ocean",
-            color_map=self.ocean_mapping,
-        ).opts(
-            **PLOT_OPTS["radar_view"],
-            shared_axes=False,
-            legend_opts={"background_fill_alpha": 0.5},
-        )
+        with self._lock:
+            self.update_data()
+            with profiling.stage("plot"):
+                radar = radar_plot(
+                    self.df,
+                    PARAMS_SPIDER,
+                    OCEANS_SPIDER,
+                    g="ocean",
+                    color_map=self.ocean_mapping,
+                ).opts(
+                    **PLOT_OPTS["radar_view"],
+                    shared_axes=False,
+                    legend_opts={"background_fill_alpha": 0.5},
+                )
+            return profiling.HoloViews(radar)
 
     @param.depends("version", "parameter", "plot_type")
+    @concurrency.offload
+    @profiling.instrument
     def hist(self):
-        # Update the DataFrame based on the selected version
-        self.update_data()
-        hist = hist_(
-            self.df,
-            self.parameter,
-            self.get_parameter_name(PARAMS),
-            g="ocean",
-            map=self.ocean_mapping,
-            type=self.plot_type,
-        )
-        return hist.opts(
-            shared_axes=False,
-            **PLOT_OPTS["hist_view"],
-        )
+        with self._lock:
+            # Update the DataFrame based on the selected version
+            self.update_data()
+            with profiling.stage("plot"):
+                hist = hist_(
+                    self.df,
+                    self.parameter,
+                    self.get_parameter_name(PARAMS),
+                    g="ocean",
+                    map=self.ocean_mapping,
+                    type=self.plot_type,
+                ).opts(
+                    shared_axes=False,
+                    **PLOT_OPTS["hist_view"],
+                )
+            return profiling.HoloViews(hist)
 
 
 # Instantiate the dashboard and create the layout
 dashboard = Dashboard()
+version = pn.widgets.Select.from_param(dashboard.param.version, name="Version")
+watcher.follow_versions(version)
 layout = pn.Row(
     pn.Column(
         pn.Row(
-            dashboard.param.version,
+            version,
             dashboard.param.parameter,
             dashboard.param.plot_type,
         ),
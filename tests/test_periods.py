@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from seareport_skill import periods
+
+
+@pytest.fixture()
+def folders(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    # The series are converted to Arrow in `assets` of the current directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(periods, "OBSERVED", tmp_path / "surge")
+    monkeypatch.setattr(periods, "MODELS_FOLDER", tmp_path / "model")
+    monkeypatch.setattr(periods, "PERIODS_FOLDER", tmp_path / "periods")
+    (tmp_path / "surge").mkdir()
+    (tmp_path / "model").mkdir()
+    return tmp_path
+
+
+def _write(path: pathlib.Path, values: np.ndarray) -> pathlib.Path:
+    index = pd.date_range("2023-01-01", periods=len(values), freq="1h")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({"elev": values}, index=index).to_parquet(path)
+    return path
+
+
+def test_period_stats() -> None:
+    index = pd.date_range("2023-01-01", "2023-03-31 23:00", freq="1h")
+    rng = np.random.default_rng(0)
+    obs = pd.Series(rng.normal(size=len(index)), index=index)
+    sim = obs + rng.normal(0, 0.1, len(index))
+    stats = periods.period_stats(sim, obs)
+    assert stats.index.tolist() == periods.PERIODS
+    # Only January to March have values
+    assert stats.loc[["01", "02", "03"]].notna().all().all()
+    assert stats.loc[["04", "JJA", "SON"], "rmse"].isna().all()
+    assert stats.loc[["DJF", "MAM"], "rmse"].notna().all()
+
+
+def test_build_station_without_values(folders: pathlib.Path) -> None:
+    n = 24 * 60
+    _write(folders / "surge" / "abcd.parquet", np.sin(np.arange(n) / 10))
+    _write(folders / "surge" / "efgh.parquet", np.full(n, np.nan))
+    _write(folders / "model" / "v1" / "abcd.parquet", np.sin(np.arange(n) / 10))
+    _write(folders / "model" / "v2" / "abcd.parquet", np.full(n, np.nan))
+    _write(folders / "model" / "v1" / "efgh.parquet", np.sin(np.arange(n) / 10))
+    models = [folders / "model" / "v1", folders / "model" / "v2"]
+    stats = periods.build_station("abcd", models)
+    assert set(stats["version"]) == {"v1"}
+    assert len(stats) == len(periods.PERIODS)
+    assert periods.build_station("efgh", models).empty
+
+
+def test_build_without_stats(folders: pathlib.Path) -> None:
+    assert periods.build(max_workers=1) == periods.PERIODS_FOLDER
+    assert not periods.PERIODS_FOLDER.exists()
+    _write(folders / "surge" / "abcd.parquet", np.full(24, np.nan))
+    _write(folders / "model" / "v1" / "abcd.parquet", np.ones(24))
+    periods.build(max_workers=1)
+    assert not periods.PERIODS_FOLDER.exists()
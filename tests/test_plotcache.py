@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import holoviews as hv
+import pandas as pd
+from bokeh.document import Document
+
+from seareport_skill import plotcache
+
+hv.extension("bokeh")
+
+
+def test_loads_new_ids() -> None:
+    curve = hv.Curve(pd.Series([1.0, 2.0, 3.0]))
+    model = hv.render(curve * hv.Points([(0, 1), (1, 2)]), backend="bokeh")
+    text = plotcache._dumps(model)
+    # The models of this session were given the same IDs as the cached ones, as in another worker
+    doc = Document()
+    doc.add_root(model)
+    loaded = [plotcache._loads(text) for _ in range(2)]
+    for root in loaded:
+        doc.add_root(root)
+    ids = [m.id for m in doc.models]
+    assert len(ids) == len(set(ids))
+    for root in loaded:
+        # The references follow the new IDs
+        assert doc.get_model_by_id(root.id) is root
+        assert doc.get_model_by_id(root.x_range.id) is root.x_range
+        assert root.x_range is not model.x_range
+        assert root.renderers[0].data_source.data.keys() == (
+            model.renderers[0].data_source.data.keys()
+        )
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyextremes
+import pytest
+
+from seareport_skill import pot
+
+
+def _series(seed: int, periods: int = 24 * 365, freq: str = "1h") -> pd.Series:
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2023-01-01", periods=periods, freq=freq)
+    # A tide and some noise: the exceedances come in clusters of a few hours
+    tide = np.sin(np.arange(periods) * 2 * np.pi / 12.42)
+    return pd.Series(tide + rng.normal(0, 0.3, periods), index=index, name="elev")
+
+
+def _reference(
+    ts: pd.Series, threshold: float, r: str, extremes_type: str
+) -> pd.Series:
+    return pyextremes.get_extremes(
+        ts, "POT", extremes_type=extremes_type, threshold=threshold, r=r
+    )
+
+
+@pytest.mark.parametrize("extremes_type", ["high", "low"])
+@pytest.mark.parametrize("r", ["6h", "24h", "72h"])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_same_as_pyextremes(seed: int, r: str, extremes_type: str) -> None:
+    ts = _series(seed)
+    quantile = 0.99 if extremes_type == "high" else 0.01
+    threshold = ts.quantile(quantile)
+    pd.testing.assert_series_equal(
+        pot.get_extremes(ts, threshold, r, extremes_type),
+        _reference(ts, threshold, r, extremes_type),
+    )
+
+
+@pytest.mark.parametrize("extremes_type", ["high", "low"])
+def test_nan_gaps(extremes_type: str) -> None:
+    ts = _series(3)
+    rng = np.random.default_rng(3)
+    # Missing values, long gaps without any time step and a changing time step
+    ts.iloc[rng.choice(len(ts), 500, replace=False)] = np.nan
+    ts.iloc[1000:1200] = np.nan
+    ts = ts.drop(ts.index[3000:3500])
+    ts = pd.concat([ts, _series(4, periods=24 * 30 * 6, freq="10min")])
+    ts = ts[~ts.index.duplicated()].sort_index()
+    quantile = 0.98 if extremes_type == "high" else 0.02
+    threshold = ts.quantile(quantile)
+    pd.testing.assert_series_equal(
+        pot.get_extremes(ts, threshold, "24h", extremes_type),
+        _reference(ts, threshold, "24h", extremes_type),
+    )
+
+
+@pytest.mark.parametrize("extremes_type", ["high", "low"])
+def test_cluster_boundary(extremes_type: str) -> None:
+    sign = 1 if extremes_type == "high" else -1
+    index = pd.DatetimeIndex(
+        [
+            "2023-01-01 00:00:00",
+            # Exactly `r` after the previous exceedance: same cluster
+            "2023-01-02 00:00:00",
+            # Just over `r`: a new cluster
+            "2023-01-03 00:00:01",
+            # A tie within the cluster: the first one is kept
+            "2023-01-03 06:00:00",
+            "2023-01-03 07:00:00",
+            "2023-01-10 00:00:00",
+        ]
+    )
+    values = sign * np.array([2.0, 3.0, 1.5, 4.0, 4.0, 2.5])
+    ts = pd.Series(values, index=index)
+    threshold = sign * 1.0
+    extremes = pot.get_extremes(ts, threshold, "24h", extremes_type)
+    pd.testing.assert_series_equal(
+        extremes, _reference(ts, threshold, "24h", extremes_type)
+    )
+    assert extremes.index.tolist() == [index[1], index[3], index[5]]
+
+
+def test_no_exceedance() -> None:
+    ts = _series(5)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        extremes = pot.get_extremes(ts, 100.0)
+        reference = _reference(ts, 100.0, "24h", "high")
+    assert len(caught) == 2
+    assert str(caught[0].message) == str(caught[1].message)
+    assert extremes.empty and reference.empty
+    # pyextremes returns an object index when there is no extreme, it stays a DatetimeIndex here
+    assert isinstance(extremes.index, pd.DatetimeIndex)
+    assert (extremes.name, extremes.dtype) == (reference.name, reference.dtype)
+    assert extremes.index.name == reference.index.name
+
+
+def test_invalid_extremes_type() -> None:
+    with pytest.raises(ValueError):
+        pot.get_extremes(_series(6), 1.0, extremes_type="both")
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from seareport_skill import pyramid
+
+
+def _series() -> pd.Series:
+    index = pd.date_range("2023-01-01", periods=30 * 24 * 60, freq="1min")
+    rng = np.random.default_rng(0)
+    series = pd.Series(rng.normal(size=len(index)), index=index, dtype=np.float32)
+    # A gap: the counts of its bins are missing
+    return series.drop(series.index[5000:9000])
+
+
+def _levels(series: pd.Series) -> dict[str, pd.DataFrame]:
+    return {level: pyramid.envelope(series, level) for level in pyramid.LEVELS}
+
+
+def test_envelope() -> None:
+    series = _series()
+    df = pyramid.envelope(series, "1h")
+    assert list(df.columns) == list(pyramid.COLUMNS)
+    assert df["count"].dtype == np.float32
+    assert df["count"].sum() == len(series)
+    assert (df["count"] <= 60).all()
+
+
+@pytest.mark.parametrize(
+    "start, end, full",
+    [
+        (None, None, False),
+        ("2023-01-10", "2023-01-20", False),
+        ("2023-01-10", "2023-01-10 12:00", True),
+        ("2023-01-10 10:17", "2023-01-10 11:00", True),
+        # Within the gap, only the values around it are read
+        ("2023-01-04 12:00", "2023-01-06 12:00", True),
+    ],
+)
+def test_select(start: str | None, end: str | None, full: bool) -> None:
+    series = _series()
+    reads = []
+
+    def read() -> pd.Series:
+        reads.append((start, end))
+        return series.loc[start:end]
+
+    selected = pyramid.select(read, _levels(series), start, end)
+    assert bool(reads) == full
+    assert len(selected) <= pyramid.MAX_POINTS
+    if full:
+        pd.testing.assert_series_equal(selected, series.loc[start:end])
+    else:
+        assert selected.min() == series.loc[start:end].min()
+        assert selected.max() == series.loc[start:end].max()
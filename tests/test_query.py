@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import pathlib
+
+import pandas as pd
+import pytest
+
+from seareport_skill import load_stats
+from seareport_skill import query
+
+ROOT = pathlib.Path(__file__).parents[1]
+PERCENTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+# With and without missing values
+METRICS = ["rmse", "cr", "R1", "error95m"]
+
+
+@pytest.fixture(autouse=True)
+def _assets(monkeypatch: pytest.MonkeyPatch) -> None:
+    # The assets are relative to the root of the repository
+    monkeypatch.chdir(ROOT)
+
+
+def _reference(bounds: tuple[float, float] | None) -> pd.DataFrame:
+    stats = load_stats()
+    frames = []
+    for metric in METRICS:
+        values = stats[metric].astype(float)
+        if bounds is not None:
+            low, high = bounds
+            values = values.where((values > low) & (values < high))
+        described = (
+            values.groupby(stats["version"], observed=True)
+            .describe(percentiles=PERCENTILES)
+            .reset_index()
+        )
+        frames.append(described.assign(metric=metric))
+    df = pd.concat(frames).sort_values(["metric", "version"], ignore_index=True)
+    return df[["metric", "version", *df.columns.drop(["metric", "version"])]]
+
+
+@pytest.mark.parametrize("bounds", [None, (-2.0, 2.0), (0.0, 0.1)])
+def test_describe_same_as_pandas(bounds: tuple[float, float] | None) -> None:
+    assert load_stats()[METRICS].isna().any().any()
+    summary = query.describe(METRICS, percentiles=PERCENTILES, bounds=bounds)
+    reference = _reference(bounds)
+    assert (
+        summary[["metric", "version"]]
+        .astype(str)
+        .equals(reference[["metric", "version"]].astype(str))
+    )
+    pd.testing.assert_frame_equal(
+        summary.drop(columns=["metric", "version"]).astype(float),
+        reference.drop(columns=["metric", "version"]),
+        rtol=1e-5,
+    )
+
+
+def test_describe_versions() -> None:
+    summary = query.describe(["rmse"], version="v0.0")
+    assert summary["version"].tolist() == ["v0.0"]
+    assert (
+        summary["count"].item()
+        == load_stats().query("version == 'v0.0'")["rmse"].count()
+    )
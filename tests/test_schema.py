@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from seareport_skill import assign_oceans
+from seareport_skill import load_stats
+from seareport_skill import schema
+
+ROOT = pathlib.Path(__file__).parents[1]
+
+
+@pytest.fixture(autouse=True)
+def _assets(monkeypatch: pytest.MonkeyPatch) -> None:
+    # The assets are relative to the root of the repository
+    monkeypatch.chdir(ROOT)
+
+
+def _plain_stats() -> pd.DataFrame:
+    # The stats as loaded before the compact schema: float64 and Python strings
+    frames = [
+        pd.read_parquet(path).astype(float).assign(version=path.stem)
+        for path in sorted(pathlib.Path("assets").glob("v*.parquet"))
+    ]
+    return assign_oceans(pd.concat(frames))
+
+
+def test_load_stats_is_compact() -> None:
+    stats = load_stats()
+    schema.validate(stats)
+    assert isinstance(stats.index, pd.CategoricalIndex)
+    for column in schema.CATEGORICALS:
+        assert isinstance(stats[column].dtype, pd.CategoricalDtype)
+    metrics = stats.columns.difference(schema.CATEGORICALS + schema.COORDINATES)
+    assert len(metrics) and (stats[metrics].dtypes == np.float32).all()
+    assert (stats[schema.COORDINATES].dtypes == np.float64).all()
+
+
+def test_compact() -> None:
+    plain = _plain_stats()
+    with pytest.raises(TypeError):
+        schema.validate(plain)
+    stats = schema.compact(plain)
+    schema.validate(stats)
+    assert stats.index.tolist() == plain.index.tolist()
+    for column in schema.CATEGORICALS:
+        assert stats[column].astype(object).equals(plain[column])
+    np.testing.assert_array_equal(
+        stats[schema.COORDINATES].to_numpy(), plain[schema.COORDINATES].to_numpy()
+    )
+    metrics = plain.columns.difference(schema.CATEGORICALS + schema.COORDINATES)
+    np.testing.assert_allclose(
+        stats[metrics].to_numpy(np.float64), plain[metrics].to_numpy(), rtol=1e-6
+    )
+    # Already compact: nothing to convert
+    assert schema.compact(stats) is stats
+
+
+def test_footprint_below_baseline() -> None:
+    stats = load_stats()
+    baseline = _plain_stats().memory_usage(deep=True).sum()
+    assert stats.memory_usage(deep=True).sum() < baseline / 2
+    assert schema.memory_usage(stats).sum() < baseline / 2
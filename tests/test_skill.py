@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+import seastats
+from seastats.stats import align_ts
+
+from seareport_skill import skill
+
+GENERAL_METRICS = [m for m in skill.METRICS if not m.endswith("_95")]
+
+
+def _obs(seed: int) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    # Irregular timestamps with seconds, as the raw observations
+    index = pd.date_range("2023-01-01", periods=6 * 24 * 60, freq="1min")
+    index = index + pd.to_timedelta(rng.integers(0, 50, len(index)), unit="s")
+    values = np.sin(np.arange(len(index)) * 2 * np.pi / (12.42 * 60))
+    obs = pd.Series(values + rng.normal(0, 0.05, len(index)), index=index)
+    obs.iloc[rng.choice(len(obs), 300, replace=False)] = np.nan
+    # A gap of a few hours in the observations
+    return obs.drop(obs.index[3000:3300])
+
+
+def _sim(seed: int, freq: str, start: str = "2023-01-01") -> pd.Series:
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, "2023-01-06 12:00", freq=freq)
+    minutes = (index - pd.Timestamp("2023-01-01")).total_seconds() / 60
+    values = 1.1 * np.sin(np.asarray(minutes) * 2 * np.pi / (12.42 * 60) + 0.1)
+    return pd.Series(values + rng.normal(0.05, 0.1, len(index)), index=index)
+
+
+def _reference(sim: pd.Series, obs: pd.Series) -> pd.Series:
+    sim_, obs_ = align_ts(sim, obs)
+    stats = seastats.get_stats(sim_, obs_, metrics=GENERAL_METRICS)
+    stats_95 = seastats.get_stats(sim_, obs_, metrics=["rms", "cr"], quantile=0.95)
+    stats.update(rms_95=stats_95["rms"], cr_95=stats_95["cr"])
+    return pd.Series(stats)[skill.METRICS].astype(float)
+
+
+def _sims(seed: int) -> dict[str, pd.Series]:
+    with_gap = _sim(seed + 3, "1h")
+    return {
+        "10min": _sim(seed, "10min"),
+        "1h": _sim(seed + 1, "1h"),
+        "15min": _sim(seed + 2, "15min", start="2023-01-02"),
+        # Missing values and a day without any output
+        "gaps": with_gap.where(with_gap.index.day != 3).drop(with_gap.index[5:10]),
+    }
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_same_as_seastats(seed: int) -> None:
+    obs = _obs(seed)
+    sims = _sims(seed * 10)
+    stats = skill.get_stats(sims, obs)
+    assert stats.index.tolist() == list(sims)
+    for name, sim in sims.items():
+        pd.testing.assert_series_equal(
+            stats.loc[name], _reference(sim, obs), check_names=False, rtol=1e-9
+        )
+
+
+def test_column_same_as_align_ts() -> None:
+    obs = _obs(3)
+    sims = _sims(30)
+    index, sim_values, obs_values = skill.align(sims, obs)
+    for i, sim in enumerate(sims.values()):
+        sim_, obs_ = skill.column(index, sim_values, obs_values, i)
+        sim_ref, obs_ref = align_ts(sim, obs)
+        np.testing.assert_array_equal(sim_.index, sim_ref.index)
+        np.testing.assert_allclose(sim_.to_numpy(), sim_ref.to_numpy())
+        np.testing.assert_allclose(obs_.to_numpy(), obs_ref.to_numpy())
+
+
+def test_no_common_values() -> None:
+    obs = _obs(4)
+    sim = _sim(40, "1h")
+    sims = {"before": sim.set_axis(sim.index - pd.Timedelta("30D"))}
+    stats = skill.get_stats(sims, obs)
+    assert stats.loc["before"].isna().all()
+
+
+def test_invalid_arguments() -> None:
+    obs = _obs(5)
+    sim = _sim(50, "1h")
+    with pytest.raises(TypeError):
+        skill.align(sim, obs)  # type: ignore[arg-type]
+    with pytest.raises(TypeError):
+        skill.align({"sim": sim}, {"obs": obs})  # type: ignore[arg-type]
+    _, sim_values, obs_values = skill.align({"sim": sim}, obs)
+    with pytest.raises(ValueError):
+        skill.compute_stats(sim_values, obs_values, ["a", "b"])
+    with pytest.raises(ValueError):
+        skill.compute_stats(sim_values, obs_values[1:], ["sim"])
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from seareport_skill import store
+
+
+@pytest.fixture()
+def folder(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    # The stores are written in `assets` of the current directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "model" / "v1"
+
+
+def _write(folder: pathlib.Path, value: float) -> None:
+    folder.mkdir(parents=True, exist_ok=True)
+    index = pd.date_range("2023-01-01", periods=500, freq="10min")
+    for station in ("abcd", "efgh"):
+        values = np.full(len(index), value, dtype=np.float32)
+        path = folder / f"{station}.parquet"
+        pd.DataFrame({"elev": values}, index=index).to_parquet(path)
+        # Newer than the stores
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + int(value) * 10**9))
+
+
+def test_zarr_swap(folder: pathlib.Path) -> None:
+    _write(folder, 1.0)
+    target = store.build(folder, "zarr")
+    assert target.is_symlink()
+    before = store.ZarrStore(target)
+    _write(folder, 2.0)
+    store.build(folder, "zarr")
+    # The reader opened before the rebuild still reads the previous group
+    assert before.series("abcd").unique().tolist() == [1.0]
+    assert store.ZarrStore(target).series("abcd").unique().tolist() == [2.0]
+    _write(folder, 3.0)
+    store.build(folder, "zarr")
+    assert store.ZarrStore(target).series("efgh").unique().tolist() == [3.0]
+    # The latest group and the previous one
+    assert len(store._versions(target)) == 2
+    assert target.resolve() == store._versions(target)[-1].resolve()
+
+
+def test_other_backend_removed(folder: pathlib.Path) -> None:
+    _write(folder, 1.0)
+    target = store.build(folder, "zarr")
+    store.build(folder, "arrow")
+    assert not target.is_symlink() and not target.exists()
+    assert store._versions(target) == []
+    assert store.open_store(folder).series("abcd").unique().tolist() == [1.0]
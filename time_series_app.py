@@ -2,26 +2,29 @@ from __future__ import annotations
 
 import glob
 import logging
+import pathlib
 
 import colorcet as cc
 import holoviews as hv
 import hvplot.pandas  # noqa: F401
 import pandas as pd
 import panel as pn
+import param
 from holoviews import opts
 from holoviews.operation.datashader import rasterize
 from holoviews.operation.datashader import spread
-from pyextremes import get_extremes
-from seastats.stats import align_ts
 from seastats.stats import get_percentiles
 from seastats.stats import get_slope_intercept
-from seastats.stats import get_stats
-from seastats.storms import get_extremes_ts
-from seastats.storms import match_extremes
 
+from seareport_skill import concurrency
+from seareport_skill import extremes
 from seareport_skill import load_countries
-from seareport_skill import load_model_stats
+from seareport_skill import profiling
+from seareport_skill import service
 from seareport_skill import settings
+from seareport_skill import skill
+from seareport_skill import watcher
+from seareport_skill import windows
 from utils.hists import scatter_plot
 
 # sea stats functions
@@ -30,7 +33,7 @@ from utils.hists import scatter_plot
 logging.basicConfig(level=10)
 logger = logging.getLogger()
 
-pn.extension("mathjax")
+pn.extension("mathjax", loading_indicator=True)
 pn.extension("tabulator")
 
 
@@ -41,8 +44,7 @@ if len(MODELS) > 0:
 else:
     DEFAULT_VAL = []
 CMAP_ = cc.colorwheel
-
-statsv0 = load_model_stats("v0.0")
+SEARCH_RESULTS = 20
 
 version = pn.widgets.Select(
     name="Model Version for map", options=settings.VERSIONS, sizing_mode="stretch_width"
@@ -63,8 +65,21 @@ quantile = pn.widgets.FloatInput(
     name="Quantile", value=0.9, step=1e-3, start=0, end=1, sizing_mode="stretch_width"
 )
 
+# The options are the search results of the text being typed, see `update_station_options`
 station = pn.widgets.AutocompleteInput(
-    name="Station", options=list(statsv0.index), sizing_mode="stretch_width"
+    name="Station",
+    options=[],
+    search_strategy="includes",
+    sizing_mode="stretch_width",
+)
+
+# The whole period by default, the map shows the metrics of the selected period otherwise
+period = pn.widgets.DatetimeRangePicker(
+    name="Period for map",
+    start=pd.Timestamp(settings.TMIN).to_pydatetime(),
+    end=pd.Timestamp(settings.TMAX).to_pydatetime(),
+    value=None,
+    sizing_mode="stretch_width",
 )
 
 show_colors = pn.widgets.Checkbox(
@@ -84,6 +99,7 @@ scatter_view = {
     "height": 400,
 }
 
+watcher.follow_versions(version)
 if pn.state.location:
     pn.state.location.sync(version, {"value": version.name})
     pn.state.location.sync(version_plot, {"value": version.name})
@@ -92,24 +108,59 @@ if pn.state.location:
     pn.state.location.sync(quantile, {"value": quantile.name})
 
 
-def load_parquet(folder, id):
-    return pd.read_parquet(f"{folder}/{id}.parquet")
-
-
 def update_station_from_map(index):
     if index:
-        selected_id = statsv0.iloc[index].index[0]
+        # The positions are those of the stations of the version shown on the map
+        selected_id = stations_pipe.data.index[index[0]]
         station.value = selected_id
     else:
         station.value = ""
 
 
+def update_station_options(*_, **__):
+    # Only the best matches among the stations visible on the map are sent to the browser
+    text = station.value_input
+    if not text:
+        station.options = []
+        return
+    x_range, y_range = view_stream.x_range, view_stream.y_range
+    in_view = None
+    if x_range is not None and y_range is not None:
+        (west, east), (south, north) = x_range, y_range
+        index = service.station_index(version.value)
+        in_view = index.within_bbox(west, south, east, north)
+    results = service.search_stations(
+        text, k=SEARCH_RESULTS, version=version.value, among=in_view
+    )
+    station.options = list(results.index)
+
+
 # PLOTTING FUNCTIONS
+def envelope_curve(station_val: str, model: str, color="black", label=""):
+    """
+    The time series downsampled to the current x-range, at full resolution when zoomed in
+    """
+
+    def curve(x_range):
+        return hv.Curve(service.envelope(station_val, model, x_range), label=label)
+
+    return hv.DynamicMap(curve, streams=[hv.streams.RangeX()]).opts(
+        color=color, line_width=0.5, alpha=0.7, **ts_view, show_grid=True
+    )
+
+
 def plot_extreme_raster(
-    ts: pd.Series, quantile: float, duration_cluster: int = 72, color="black", label=""
+    ts: pd.Series,
+    quantile: float,
+    duration_cluster: int = 72,
+    color="black",
+    label="",
+    curve=None,
+    ext=None,
 ):
     """
-    this function might induce overhead if the time series is too long
+    this function might induce overhead if the time series is too long, unless the
+    downsampled `curve` and the extremes `ext` of the series are given
     """
     if ts.empty:
         ts_ = rasterize(hv.Curve((0, 0), label=label))
@@ -117,12 +168,14 @@ def plot_extreme_raster(
         th_ = hv.HLine(0)
         th_text_ = hv.Text(0, 0, "")
     else:
-        ext = get_extremes(
-            ts, "POT", threshold=ts.quantile(quantile), r=f"{duration_cluster}h"
-        )
-        ts_ = rasterize(hv.Curve(ts, label=label), line_width=0.5).opts(
-            cmap=[color], **ts_view, show_grid=True, alpha=0.7
-        )
+        if ext is None:
+            ext = extremes.compute_extremes(ts, quantile, duration_cluster)
+        if curve is None:
+            ts_ = rasterize(hv.Curve(ts, label=label), line_width=0.5).opts(
+                cmap=[color], **ts_view, show_grid=True, alpha=0.7
+            )
+        else:
+            ts_ = curve
         sc_ = hv.Scatter(ext, label=label).opts(
             opts.Scatter(line_color="black", fill_color=color, size=8)
         )
@@ -145,14 +198,17 @@ def scatter_plot_raster(
     pp_plot: bool = False,
     color="black",
     label="",
+    extremes_match=None,
 ):
     if ts1.empty or ts2.empty:
         sc_ = spread(rasterize(hv.Points((0, 0))))
         extremes_match = pd.DataFrame()
         slope, intercept = (0, 0)
     else:
-        extremes = get_extremes_ts(ts1, ts2, quantile, cluster_duration)
-        extremes_match = match_extremes(extremes)
+        if extremes_match is None:
+            extremes_match = extremes.compute_storms(
+                ts1, ts2, quantile, cluster_duration
+            )
         p = hv.Points((ts1.values, ts2.values))
         sc_ = spread(rasterize(p)).opts(
             cmap=[color], cnorm="linear", alpha=0.9, **scatter_view
@@ -180,40 +236,95 @@ def scatter_plot_raster(
         return ax_plot * lr_plot * sc_ * ext_
 
 
-# Define a tap stream and link it to the scatter plot later
-tap_stream = hv.streams.Selection1D(source=None)
+@profiling.instrument
+def station_values(version_val, metrics_val, period_val=None) -> pd.DataFrame:
+    with profiling.stage("load"):
+        stats = service.stats(version_val)
+        values = stats[metrics_val]
+        model = pathlib.Path(OBS_FOLDER, "model", version_val)
+        # Over the whole period the stats of the assets, otherwise the metrics of the period
+        if period_val is not None and metrics_val in windows.METRICS:
+            try:
+                window = service.window_stats(model, period_val)
+            except FileNotFoundError:
+                logger.warning("No windowed metrics for %s", model)
+            else:
+                values = window[metrics_val].reindex(stats.index)
+    # The metric is always sent as `value`: the glyphs keep their mapping and only the columns are patched
+    return pd.DataFrame(
+        {
+            "obs_lon": stats["obs_lon"],
+            "obs_lat": stats["obs_lat"],
+            "value": values,
+        }
+    )
 
-# Watch for selection events on the scatter plot and update the station widget accordingly
-tap_stream.add_subscriber(update_station_from_map)
 
+@profiling.instrument
+def station_points(data: pd.DataFrame) -> hv.Points:
+    with profiling.stage("plot"):
+        return scatter_plot(data, "obs_lon", "obs_lat", colorbar=True)
 
-@pn.depends(version, metrics)
-def map_plot(version_val, metrics_val) -> pn.pane.HoloViews:
-    countries = load_countries()
-    stats = load_model_stats(version_val)
-    p = scatter_plot(stats, "obs_lon", "obs_lat", colorbar=True).opts(
-        size=10,
-        color=metrics_val,
-        line_color="k",
-        line_width=1,
-        cmap="rainbow4",
-        tools=["tap"],  # Enable tap tool
+
+# Empty until the session is loaded, the stations are never loaded while the app is executed
+stations_pipe = hv.streams.Pipe(
+    data=pd.DataFrame(
+        {"obs_lon": [], "obs_lat": [], "value": []}, index=pd.Index([], dtype=object)
     )
-    tap_stream.source = p
+)
+stations = hv.DynamicMap(station_points, streams=[stations_pipe]).opts(
+    size=10,
+    color="value",
+    line_color="k",
+    line_width=1,
+    cmap="rainbow4",
+    tools=["tap"],  # Enable tap tool
+    framewise=True,
+)
+
+# Define a tap stream and link it to the scatter plot
+tap_stream = hv.streams.Selection1D(source=stations)
 
-    map_ = countries.hvplot().opts(color="white", line_alpha=0.9)
-    map_plot = (map_ * p).opts(
+# Watch for selection events on the scatter plot and update the station widget accordingly
+tap_stream.add_subscriber(update_station_from_map)
+
+view_stream = hv.streams.RangeXY(source=stations)
+view_stream.add_subscriber(update_station_options)
+station.param.watch(update_station_options, "value_input")
+
+# The basemap is sent once, the metric and version changes only update the station glyphs
+map_plot = profiling.HoloViews(
+    (load_countries().hvplot().opts(color="white", line_alpha=0.9) * stations).opts(
         **map_view,
         xlim=(-180, 180),
         ylim=(-90, 90),
-    )
-    return pn.pane.HoloViews(
-        map_plot,
-        width_policy="max",
-    )
+    ),
+    width_policy="max",
+)
+
+
+offloaded_station_values = concurrency.offload(station_values)
+
+
+@pn.depends(version, metrics, period, watch=True)
+async def update_map(version_val, metrics_val, period_val):
+    try:
+        data = await offloaded_station_values(version_val, metrics_val, period_val)
+    except param.Skip:
+        return
+    stations_pipe.send(data)
+    update_station_options()
+
+
+async def load_map():
+    await update_map(version.value, metrics.value, period.value)
+
+
+pn.state.onload(load_map)
 
 
 @pn.depends(version_plot, station.param.value, quantile, show_colors)
+@profiling.instrument
 def time_series_plots(version_plot_val, station_val, quantile_val, show_colors_val):
     if not station_val:
         emp_ = pd.DataFrame()
@@ -224,53 +335,77 @@ def time_series_plots(version_plot_val, station_val, quantile_val, show_colors_v
         return ts_pane_empty, df_pane_empty
     else:
         # 0 - store dict of dataframes for each model version
-        df_dict = {}
-        for im, model_version in enumerate(version_plot_val):
-            df_dict[model_version] = load_parquet(model_version, station_val)
-        obs = load_parquet(OBS_FOLDER + "/surge", station_val).dropna()
+        with profiling.stage("load"):
+            df_dict = {}
+            for im, model_version in enumerate(version_plot_val):
+                df_dict[model_version] = service.timeseries(station_val, model_version)
+            obs = service.timeseries(station_val, OBS_FOLDER + "/surge")
 
         # 1 - plot time series plots
-        for im, model_ in enumerate(df_dict.keys()):
-            df = df_dict[model_]
-            temp = plot_extreme_raster(
-                df[df.columns[0]], quantile_val, color=cc.glasbey[im], label=model_
+        with profiling.stage("plot"):
+            for im, model_ in enumerate(df_dict.keys()):
+                temp = plot_extreme_raster(
+                    df_dict[model_],
+                    quantile_val,
+                    color=cc.glasbey[im],
+                    label=model_,
+                    curve=envelope_curve(
+                        station_val, model_, color=cc.glasbey[im], label=model_
+                    ),
+                    ext=extremes.get_extremes(station_val, model_, quantile_val),
+                )
+                if im == 0:
+                    mod_plot = temp
+                else:
+                    mod_plot *= temp
+            # add the obs TS
+            obs_plot = plot_extreme_raster(
+                obs,
+                quantile_val,
+                color="grey",
+                label="observed",
+                curve=envelope_curve(
+                    station_val, OBS_FOLDER + "/surge", color="grey", label="observed"
+                ),
+                ext=extremes.get_extremes(
+                    station_val, OBS_FOLDER + "/surge", quantile_val
+                ),
+            )
+            #
+            ts = (mod_plot * obs_plot).opts(
+                title=station_val,
+                tools=["hover"],
             )
-            if im == 0:
-                mod_plot = temp
-            else:
-                mod_plot *= temp
-        # add the obs TS
-        obs_plot = plot_extreme_raster(
-            obs[obs.columns[0]], quantile_val, color="grey", label="observed"
-        )
-        #
-        ts = (mod_plot * obs_plot).opts(
-            title=station_val,
-            tools=["hover"],
-        )
 
         # 2 - Scatter plot + LIVE STATS
-        df_stats = pd.DataFrame()
+        # All the models are aligned to the observations at once
+        with profiling.stage("stats"):
+            index, sim_values, obs_values = skill.align(df_dict, obs)
+            df_stats = skill.compute_stats(sim_values, obs_values, list(df_dict))
         for im, model_ in enumerate(df_dict.keys()):
-            df = df_dict[model_]
-            sim_, obs_ = align_ts(df[df.columns[0]], obs[obs.columns[0]])
-            temp = scatter_plot_raster(
-                sim_,
-                obs_,
-                quantile=quantile_val,
-                cluster_duration=72,
-                color=cc.glasbey[im],
-                label=model_,
-            )
+            with profiling.stage("stats"):
+                sim_, obs_ = skill.column(index, sim_values, obs_values, im)
+                extremes_match = None
+                if not (sim_.empty or obs_.empty):
+                    extremes_match = extremes.get_storms(
+                        station_val, model_, sim_, obs_, quantile_val, 72
+                    )
+            with profiling.stage("plot"):
+                temp = scatter_plot_raster(
+                    sim_,
+                    obs_,
+                    quantile=quantile_val,
+                    cluster_duration=72,
+                    color=cc.glasbey[im],
+                    extremes_match=extremes_match,
+                    label=model_,
+                )
             if im == 0:
                 scat = temp
             else:
                 scat *= temp
-            # dataframe part
-            stats = pd.DataFrame(get_stats(sim_, obs_), index=[model_])
-            df_stats = pd.concat([df_stats, stats], axis=0)
 
-        ts_pane = pn.pane.HoloViews(ts + scat, width_policy="max")
+        ts_pane = profiling.HoloViews(ts + scat, width_policy="max")
         if show_colors_val:
             df_pane = pn.widgets.Tabulator(
                 df_stats,
@@ -294,27 +429,43 @@ time_series_column = pn.Column()
 
 
 # Define a function to update the contents of the Column based on time_series_plots
-def update_time_series_column(event=None):
-    ts_pane, df_pane = time_series_plots(
-        version_plot.value, station.value, quantile.value, show_colors.value
-    )
+offloaded_time_series_plots = concurrency.offload(time_series_plots)
+
+
+# A single watcher for all the widgets: a burst of changes results in a single update
+@pn.depends(version_plot, station.param.value, quantile, show_colors, watch=True)
+async def update_time_series_column(
+    version_plot_val, station_val, quantile_val, show_colors_val
+):
+    time_series_column.loading = True
+    try:
+        ts_pane, df_pane = await offloaded_time_series_plots(
+            version_plot_val, station_val, quantile_val, show_colors_val
+        )
+    except param.Skip:
+        # A newer update is pending, it will replace the contents
+        return
+    except Exception:
+        time_series_column.loading = False
+        raise
     # Clear the existing contents and update with new panes
     time_series_column.clear()
     time_series_column.extend([ts_pane, df_pane])
+    time_series_column.loading = False
 
 
 # Initially populate the Column
-update_time_series_column()
-# Watch for changes in the widgets and update the Column accordingly
-version_plot.param.watch(update_time_series_column, "value")
-station.param.watch(update_time_series_column, "value")
-quantile.param.watch(update_time_series_column, "value")
-show_colors.param.watch(update_time_series_column, "value")
+time_series_column.extend(
+    time_series_plots(
+        version_plot.value, station.value, quantile.value, show_colors.value
+    )
+)
 
 template = pn.template.MaterialTemplate(
     title="Time Series Analysis",
     sidebar=[
         version,
+        period,
         version_plot,
         metrics,
         station,
@@ -64,7 +64,8 @@ def hist_(src, z, z_name, g="ocean", map=None, type="box"):
     else:
         range_ = (0, 1)
 
-    df = src[[z, g]].reset_index()
+    # Not categorical: holoviews would group by all the categories, even the unselected ones
+    df = src[[z, g]].astype({g: object}).reset_index()
     #
     unique_oceans = df[g].unique()
     # Create a new DataFrame with one-hot encoded structure